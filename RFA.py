@@ -1,9 +1,28 @@
 import os
+import re
+import io
+import zlib
+import time
+import json
+import asyncio
+import hashlib
+import heapq
+import functools
+from array import array
+import mmap
+import bisect
 import struct
+import threading
+import collections
+import concurrent.futures
 import lzo
 
+@functools.lru_cache(maxsize = None)
+def uintStruct(n):
+    return(struct.Struct(str(n)+'I'))
+
 def read_i(f, n = 1, forceList = False):
-    res = struct.unpack('I'*n, f.read(4*n))
+    res = uintStruct(n).unpack(f.read(4*n))
     if n==1 and not forceList:
         return(res[0])
     return(res)
@@ -13,7 +32,7 @@ def read_s(f, length = None):
 
 def write_i(f, values):
     if not isinstance(values, (list, tuple)): values = [values]
-    return(f.write(struct.pack('I'*len(values), *values)))
+    return(f.write(uintStruct(len(values)).pack(*values)))
 
 def write_s(f, value):
     write_i(f, len(value))
@@ -22,7 +41,218 @@ def write_s(f, value):
 def write_bytes(f, value):
     return(f.write(bytearray(value)))
 
+RFA_SEGMENT_SIZE = 32768 # maximum uncompressed size of a segment
+RFA_HEADER_V11 = b"Refractor2 FlatArchive 1.1  " # v 1.1 has an additional string of 28 bytes at the start
+RFA_UINT = struct.Struct('I')
+RFA_HEADER = struct.Struct('2I') # offset of the file list, compressed
+RFA_ENTRY = struct.Struct('6I') # csize, ucsize, doffset, 3 unknowns
+RFA_SYNC_MANIFEST = ".rfasync" # written to the destination directory by extractAll(sync = True)
+RFA_INDEX_MAGIC = b"RFAIDX01"
+RFA_INDEX_HEADER = struct.Struct('=8sQqIIIII') # magic, archive size, archive mtime_ns, compressed, entries, hash table size, path data size, archive path size
+
+def normalizePath(path):
+    return(path.lower().replace('\\', '/'))
+
+def decompressSegment(data, ucsize):
+    if len(data) == 0 or ucsize == 0:
+        return(b'')
+    return(lzo.decompress(data, False, ucsize))
+
+def compressSegment(data, level = 9, detectIncompressible = False):
+    if detectIncompressible and level > 1:
+        stored = lzo.compress(data, 1, False) # the fastest level is as good as it gets for incompressible data
+        if len(stored) >= len(data):
+            return(stored)
+    return(lzo.compress(data, level, False)) # Include metadata header = False
+
+def compressSegmentTimed(data, level = 9, detectIncompressible = False): # returns (compressed data, seconds spent compressing), timed where it runs so worker processes are measured too
+    timeStart = time.perf_counter()
+    data = compressSegment(data, level, detectIncompressible)
+    return((data, time.perf_counter()-timeStart))
+
+def compressChunks(chunks, executor = None, level = 9, detectIncompressible = False, stats = None): # yields (uncompressed size, compressed data) in order, an executor compresses them in parallel
+    if executor == None:
+        for chunk in chunks:
+            if stats == None:
+                yield((len(chunk), compressSegment(chunk, level, detectIncompressible)))
+                continue
+            data, duration = compressSegmentTimed(chunk, level, detectIncompressible)
+            stats.add(segmentsCompressed = 1, bytesCompressed = len(chunk), timeCompress = duration)
+            yield((len(chunk), data))
+        return
+    pending = collections.deque()
+    maxPending = 2*(os.cpu_count() or 1)
+    def result(ucsize, future):
+        if stats == None:
+            return((ucsize, future.result()))
+        data, duration = future.result()
+        stats.add(segmentsCompressed = 1, bytesCompressed = ucsize, timeCompress = duration)
+        return((ucsize, data))
+    for chunk in chunks:
+        pending.append((len(chunk), executor.submit(compressSegment if stats == None else compressSegmentTimed, chunk, level, detectIncompressible)))
+        if len(pending) >= maxPending:
+            yield(result(*pending.popleft()))
+    while pending:
+        yield(result(*pending.popleft()))
+
+def iterChunks(chunks, size = RFA_SEGMENT_SIZE): # regroups a stream of byte strings into chunks of size bytes, the last one can be shorter
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield(bytes(buffer[:size]))
+            del buffer[:size]
+    if len(buffer) > 0:
+        yield(bytes(buffer))
+
+def hashChunks(chunks, hasher):
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield(chunk)
+
+def iterFileChunks(path, size = RFA_SEGMENT_SIZE):
+    with open(path, "rb") as f:
+        chunk = f.read(size)
+        while len(chunk) > 0:
+            yield(chunk)
+            chunk = f.read(size)
+
+def extractEntries(entries, workers = 1, processes = False): # entries: list of (rfa, fileInfo, destinationPath), returns a list of (path, exception) for files that failed
+    failures = []
+    if workers <= 1:
+        for rfa, fileInfo, destinationPath in entries:
+            try: rfa.extractEntry(fileInfo, destinationPath)
+            except Exception as e:
+                failures.append((fileInfo[0], e))
+                if rfa.stats != None: rfa.stats.addError(rfa.path, fileInfo[0], e)
+        return(failures)
+    if processes: # file granularity, every worker maps the archive itself
+        jobs = []
+        for rfa, fileInfo, destinationPath in entries:
+            if len(jobs) == 0 or jobs[-1][0] != rfa.path or len(jobs[-1][2]) >= 64:
+                jobs.append((rfa.path, rfa.compressed, []))
+            jobs[-1][2].append((fileInfo[0], fileInfo[1].csize, fileInfo[1].ucsize, fileInfo[1].doffset, destinationPath))
+        statsByPath = {entry[0].path: entry[0].stats for entry in entries}
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor: # the workers send their events back, hooks are called in this process
+            for job, future in [(job, executor.submit(extractEntriesWorker, *job, statsByPath[job[0]] != None, statsByPath[job[0]] != None and statsByPath[job[0]].hook != None)) for job in jobs]:
+                failuresWorker, statsWorker = future.result()
+                failures += failuresWorker
+                if statsWorker != None:
+                    statsByPath[job[0]].merge(statsWorker)
+        return(failures)
+    # threads at file granularity, the segments of big files are decompressed by a second pool
+    rfasOpened = [rfa for rfa in {id(entry[0]): entry[0] for entry in entries}.values() if rfa.view == None]
+    for rfa in rfasOpened:
+        rfa.open()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(workers) as fileExecutor, concurrent.futures.ThreadPoolExecutor(workers) as segmentExecutor:
+            futures = [(rfa, fileInfo[0], fileExecutor.submit(rfa.extractEntry, fileInfo, destinationPath, segmentExecutor if fileInfo[1].ucsize > RFA_SEGMENT_SIZE else None)) for rfa, fileInfo, destinationPath in entries]
+            for rfa, path, future in futures:
+                if future.exception() != None:
+                    failures.append((path, future.exception()))
+                    if rfa.stats != None: rfa.stats.addError(rfa.path, path, future.exception())
+    finally:
+        for rfa in rfasOpened:
+            rfa.close()
+    return(failures)
+
+def syncEntries(entries, destinationDir = None, workers = 1, processes = False, deleteStale = False, archives = None): # only extracts entries that changed since the last sync, returns failures like extractEntries. archives are the paths of the archives this sync is for, records of other archives are kept
+    destinationDir = "." if destinationDir == None else destinationDir
+    manifestPath = os.path.join(destinationDir, RFA_SYNC_MANIFEST)
+    try:
+        with open(manifestPath, 'r') as f:
+            manifest = json.load(f) # relative path -> [ucsize, fingerprint of the stored data, mtime_ns of the extracted file, absolute path of the archive]
+    except (OSError, ValueError):
+        manifest = {}
+    archives = set(os.path.abspath(path) for path in (set(rfa.path for rfa, fileInfo, destinationPath in entries) if archives == None else archives))
+    if workers > 1:
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            fingerprints = list(executor.map(lambda entry: entry[0].getFingerprint(entry[1]), entries))
+    else:
+        fingerprints = [rfa.getFingerprint(fileInfo) for rfa, fileInfo, destinationPath in entries]
+    manifestNew = {key: synced for key, synced in manifest.items() if len(synced) < 4 or not synced[3] in archives} # files synced from other archives into the same directory
+    extracted = {}
+    entriesChanged = []
+    for (rfa, fileInfo, destinationPath), fingerprint in zip(entries, fingerprints):
+        key = os.path.relpath(destinationPath, destinationDir)
+        archive = os.path.abspath(rfa.path)
+        synced = manifest.get(key)
+        if synced != None and synced[0] == fileInfo[1].ucsize and synced[1] == fingerprint:
+            try:
+                stat = os.stat(destinationPath)
+                if stat.st_size == synced[0] and stat.st_mtime_ns == synced[2]: # not modified since it was extracted
+                    manifestNew[key] = synced[:3] + [archive]
+                    continue
+            except OSError: pass
+        manifestNew.pop(key, None)
+        extracted[key] = (fileInfo[0], destinationPath, [fileInfo[1].ucsize, fingerprint], archive)
+        entriesChanged.append((rfa, fileInfo, destinationPath))
+    failures = extractEntries(entriesChanged, workers, processes)
+    failedPaths = set(path for path, exception in failures)
+    for key, (path, destinationPath, synced, archive) in extracted.items():
+        if not path in failedPaths:
+            manifestNew[key] = synced + [os.stat(destinationPath).st_mtime_ns, archive]
+    if deleteStale: # only files that were synced from one of the archives of this sync
+        for key, synced in manifest.items():
+            if len(synced) >= 4 and synced[3] in archives and not key in manifestNew and not key in extracted:
+                try: os.remove(os.path.join(destinationDir, key))
+                except OSError: pass
+    os.makedirs(destinationDir, exist_ok = True)
+    with open(manifestPath+".tmp", 'w') as f:
+        json.dump(manifestNew, f)
+    os.replace(manifestPath+".tmp", manifestPath)
+    return(failures)
+
+def extractEntriesWorker(rfaPath, compressed, entries, stats = False, events = False): # runs in a worker process of extractEntries, returns (failures, stats of the worker or None), events keeps the hook events for the parent
+    rfa = RefractorFlatArchive(rfaPath, read = False)
+    rfa.compressed = compressed
+    if stats: rfa.enableStats()
+    if events: rfa.stats.recordEvents()
+    failures = []
+    with rfa:
+        for path, csize, ucsize, doffset, destinationPath in entries:
+            try: rfa.extractEntry((path, RefractorFlatArchive_Info(None, csize, ucsize, doffset)), destinationPath)
+            except Exception as e:
+                failures.append((path, e))
+                if rfa.stats != None: rfa.stats.addError(rfa.path, path, e)
+    return((failures, None if rfa.stats == None else rfa.stats.getState()))
+
+def verifyArchives(paths, workers = 1): # integrity scan of whole archives in a process pool, returns {path: {"error": ..., "compressed": ..., "entries": [report of verifyEntry]}}
+    results = {}
+    jobs = []
+    for path in paths:
+        rfa = RefractorFlatArchive(path, read = False)
+        result = results[path] = {"error": None, "compressed": None, "entries": []}
+        try:
+            dataEnd = rfa.readFileList()
+        except Exception as e:
+            result["error"] = "%s: %s" % (type(e).__name__, e)
+            continue
+        result["compressed"] = rfa.compressed
+        size = 0
+        for fileInfo in rfa.fileList: # jobs of about 64 entries or 8 MiB keep all workers busy even with a few huge files
+            if len(jobs) == 0 or jobs[-1][0] != path or len(jobs[-1][3]) >= 64 or size >= 8*1024*1024:
+                jobs.append((path, rfa.compressed, dataEnd, []))
+                size = 0
+            jobs[-1][3].append((fileInfo[0], fileInfo[1].csize, fileInfo[1].ucsize, fileInfo[1].doffset))
+            size += fileInfo[1].csize
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            for job, future in [(job, executor.submit(verifyEntriesWorker, *job)) for job in jobs]:
+                results[job[0]]["entries"] += future.result()
+    else:
+        for job in jobs:
+            results[job[0]]["entries"] += verifyEntriesWorker(*job)
+    return(results)
+
+def verifyEntriesWorker(rfaPath, compressed, dataEnd, entries): # runs in a worker process of verifyArchives
+    rfa = RefractorFlatArchive(rfaPath, read = False)
+    rfa.compressed = compressed
+    with rfa:
+        return([rfa.verifyEntry((path, RefractorFlatArchive_Info(None, csize, ucsize, doffset)), dataEnd) for path, csize, ucsize, doffset in entries])
+
 class RefractorFlatArchive_Info:
+    __slots__ = ('csize', 'ucsize', 'doffset')
     def __init__(self, f = None, csize = None, ucsize = None, doffset = None):
         self.csize = read_i(f) if f != None else csize
         self.ucsize = read_i(f) if f != None else ucsize
@@ -31,108 +261,881 @@ class RefractorFlatArchive_Info:
     def write(self, f):
         write_i(f, [self.csize, self.ucsize, self.doffset])
         
-class RefractorFlatArchive:
-    def __init__(self, path, read = True):
+class RefractorFlatArchive_FileList: # entries are stored in arrays, (path, RefractorFlatArchive_Info) tuples are only created when accessed
+    def __init__(self, pathBlob = b""):
+        self.pathBlob = pathBlob # utf-8 paths are decoded from here on demand
+        self.pathStart = array('I')
+        self.pathLength = array('I')
+        self.csize = array('I')
+        self.ucsize = array('I')
+        self.doffset = array('I')
+        self.alive = bytearray() # 0 for removed entries
+        self.count = 0
+        self.index = None # normalized path -> row, only built once entries are removed or fileIndex is used
+        self.duplicates = False # some normalized paths occur more than once
+        self.sortedKeys = None # sorted normalized paths for prefix queries, built on first use
+        self.hashTable = None # open addressing table of row+1 by crc32 of the normalized path, built on first lookup and used until index is built
+        self.indexCache = None # mmap of the index cache file the columns are read from
+        self.changes = 0 # counts added and removed entries, lets a group notice that its merged index is outdated
+        self.liveRows = None # rows of the entries that are not removed, built by __getitem__ once entries are removed
+    
+    def add(self, pathStart, pathLength, csize, ucsize, doffset):
+        self.pathStart.append(pathStart)
+        self.pathLength.append(pathLength)
+        self.csize.append(csize)
+        self.ucsize.append(ucsize)
+        self.doffset.append(doffset)
+        self.alive.append(1)
+        self.count += 1
+        self.changes += 1
+        self.liveRows = None
+        self.sortedKeys = None
+        if self.index != None:
+            self.addToIndex(len(self.alive)-1)
+        elif self.hashTable != None:
+            if 2*self.count > len(self.hashTable):
+                self.hashTable = None # rebuilt with a larger size on the next lookup
+            else:
+                self.addToHashTable(self.hashTable, len(self.alive)-1)
+    
+    def __len__(self):
+        return(self.count)
+    
+    def __iter__(self):
+        for row in self.rows():
+            yield(self.entry(row))
+    
+    def __getitem__(self, i): # indexes and slices like the list of entries this used to be
+        rows = range(self.count)[i]
+        if self.count != len(self.alive): # positions are mapped to rows through the rows of the live entries
+            if self.liveRows == None:
+                self.liveRows = array('I', self.rows())
+            rows = self.liveRows[i]
+        if isinstance(i, slice):
+            return([self.entry(row) for row in rows])
+        return(self.entry(rows))
+    
+    def rows(self):
+        if self.count == len(self.alive):
+            return(range(self.count))
+        return((row for row in range(len(self.alive)) if self.alive[row]))
+    
+    def path(self, row):
+        start = self.pathStart[row]
+        return(str(self.pathBlob[start:start+self.pathLength[row]], "utf-8", errors="ignore"))
+    
+    def entry(self, row):
+        return((self.path(row), RefractorFlatArchive_Info(None, self.csize[row], self.ucsize[row], self.doffset[row])))
+    
+    def paths(self):
+        return([self.path(row) for row in self.rows()])
+    
+    def addToIndex(self, row):
+        key = normalizePath(self.path(row))
+        if self.index.setdefault(key, row) != row:
+            self.duplicates = True
+    
+    def getIndex(self):
+        if self.index == None:
+            self.index = {}
+            for row in self.rows():
+                self.addToIndex(row)
+            self.hashTable = None
+        return(self.index)
+    
+    def iterKeys(self): # yields (normalized path, row), without building the index
+        for row in self.rows():
+            yield((normalizePath(self.path(row)), row))
+    
+    def find(self, key): # returns the row of the normalized path key or None
+        if self.index != None:
+            return(self.index.get(key))
+        if self.hashTable == None:
+            self.hashTable = self.buildHashTable()
+        mask = len(self.hashTable)-1
+        slot = zlib.crc32(key.encode("utf-8")) & mask
+        row = self.hashTable[slot]
+        while row != 0:
+            if self.alive[row-1] and normalizePath(self.path(row-1)) == key:
+                return(row-1)
+            slot = (slot+1) & mask
+            row = self.hashTable[slot]
+        return(None)
+    
+    def addToHashTable(self, hashTable, row, key = None):
+        if key == None:
+            key = normalizePath(self.path(row))
+        mask = len(hashTable)-1
+        slot = zlib.crc32(key.encode("utf-8")) & mask
+        while hashTable[slot] != 0:
+            if normalizePath(self.path(hashTable[slot]-1)) == key: # the first entry wins, as in the index
+                self.duplicates = True
+                return
+            slot = (slot+1) & mask
+        hashTable[slot] = row+1
+    
+    def buildHashTable(self):
+        tableSize = 1
+        while tableSize < 2*self.count: tableSize *= 2
+        hashTable = array('I', [0])*tableSize
+        for key, row in self.iterKeys():
+            self.addToHashTable(hashTable, row, key)
+        return(hashTable)
+    
+    def remove(self, key): # removes every entry with the normalized path key
+        index = self.getIndex()
+        if not key in index:
+            return(False)
+        rows = [index.pop(key)]
+        if self.duplicates:
+            rows = [row for row in self.rows() if normalizePath(self.path(row)) == key]
+        for row in rows:
+            self.alive[row] = 0
+            self.count -= 1
+        self.changes += 1
+        self.liveRows = None
+        self.sortedKeys = None
+        return(True)
+    
+    def releaseIndexCache(self): # copies the columns out of the index cache file and closes its mapping
+        if self.indexCache == None:
+            return
+        columns = []
+        for column in [self.pathStart, self.pathLength, self.csize, self.ucsize, self.doffset, self.hashTable]:
+            columns.append(None if column == None else array('I', column.tobytes()) if isinstance(column, memoryview) else column)
+            if isinstance(column, memoryview): column.release()
+        self.pathStart, self.pathLength, self.csize, self.ucsize, self.doffset, self.hashTable = columns
+        pathBlob, self.pathBlob = self.pathBlob, bytes(self.pathBlob)
+        pathBlob.release()
+        try: self.indexCache.close()
+        except BufferError: pass # paths handed out as views keep the mapping alive until they are released
+        self.indexCache = None
+    
+    def getSortedKeys(self):
+        if self.sortedKeys == None:
+            self.sortedKeys = sorted(self.getIndex() if self.index != None else {key for key, row in self.iterKeys()})
+        return(self.sortedKeys)
+
+class RefractorFlatArchive_Cache: # LRU cache of decompressed segments, can be shared by the archives of a group
+    def __init__(self, maxBytes = 64*1024*1024):
+        self.maxBytes = maxBytes
+        self.size = 0
+        self.segments = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            data = self.segments.get(key)
+            if data == None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.segments.move_to_end(key)
+            return(data)
+    
+    def put(self, key, data):
+        if len(data) > self.maxBytes:
+            return
+        with self.lock:
+            if key in self.segments:
+                self.size -= len(self.segments.pop(key))
+            self.segments[key] = data
+            self.size += len(data)
+            while self.size > self.maxBytes:
+                self.size -= len(self.segments.popitem(last = False)[1])
+                self.evictions += 1
+    
+    def clear(self):
+        with self.lock:
+            self.segments.clear()
+            self.size = 0
+    
+    def getStats(self):
+        return({"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "segments": len(self.segments), "size": self.size, "maxBytes": self.maxBytes})
+
+class RefractorFlatArchive_Stats: # opt-in I/O counters, can be shared by the archives of a group. hook(event, values) is called for every extracted entry ("entry") and every failed one ("error"), events of worker processes are replayed by merge
+    COUNTERS = ["opens", "bytesRead", "segmentsDecompressed", "bytesDecompressed", "timeDecompress", "segmentsCompressed", "bytesCompressed", "timeCompress", "entries", "timeEntries", "errors"]
+    
+    def __init__(self, hook = None, slowestEntries = 10):
+        self.hook = hook
+        self.slowestEntries = slowestEntries
+        self.events = None # (event, values) kept by recordEvents
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.slowest = [] # min heap of (seconds, archive path, path), the fastest of the slowest entries is replaced first
+    
+    def add(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                self.counters[name] += value
+    
+    def addSlowest(self, duration, rfaPath, path):
+        if len(self.slowest) < self.slowestEntries:
+            heapq.heappush(self.slowest, (duration, rfaPath, path))
+        elif self.slowestEntries > 0 and duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, rfaPath, path))
+    
+    def addEntry(self, rfaPath, path, ucsize, duration):
+        with self.lock:
+            self.counters["entries"] += 1
+            self.counters["timeEntries"] += duration
+            self.addSlowest(duration, rfaPath, path)
+        if self.hook != None:
+            self.hook("entry", {"archive": rfaPath, "path": path, "ucsize": ucsize, "time": duration})
+    
+    def addError(self, rfaPath, path, exception):
+        self.add(errors = 1)
+        if self.hook != None:
+            self.hook("error", {"archive": rfaPath, "path": path, "exception": exception})
+    
+    def recordEvents(self): # keeps the events instead of calling a hook, a worker process sends them back with getState
+        self.events = []
+        self.hook = lambda event, values: self.events.append((event, values))
+    
+    def getState(self): # picklable copy, used to send the stats of worker processes back
+        with self.lock:
+            return((dict(self.counters), list(self.slowest), [] if self.events == None else list(self.events)))
+    
+    def merge(self, state):
+        counters, slowest, events = state
+        with self.lock:
+            for name, value in counters.items():
+                self.counters[name] += value
+            for entry in slowest:
+                self.addSlowest(*entry)
+        if self.hook != None:
+            for event, values in events:
+                self.hook(event, values)
+    
+    def getStats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["slowestEntries"] = [{"archive": rfaPath, "path": path, "time": duration} for duration, rfaPath, path in sorted(self.slowest, reverse = True)]
+        return(stats)
+
+class RefractorFlatArchive_File(io.RawIOBase):
+    def __init__(self, rfa, fileInfo):
+        super().__init__()
+        self.rfa = rfa
+        self.fileInfo = fileInfo
+        self.name = fileInfo[0]
+        self.position = 0
+        self.segmentMemo = {}
+    
+    def readable(self):
+        return(True)
+    
+    def seekable(self):
+        return(True)
+    
+    def tell(self):
+        return(self.position)
+    
+    def seek(self, offset, whence = io.SEEK_SET):
+        if whence == io.SEEK_CUR: offset += self.position
+        elif whence == io.SEEK_END: offset += self.fileInfo[1].ucsize
+        if offset < 0:
+            raise ValueError("negative seek position "+str(offset))
+        self.position = offset
+        return(self.position)
+    
+    def read(self, size = -1):
+        data = self.rfa.readBlockRange(self.fileInfo, self.position, None if size == None or size < 0 else size, self.segmentMemo)
+        self.position += len(data)
+        return(data)
+    
+    def readall(self):
+        return(self.read())
+    
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return(len(data))
+
+class RefractorFlatArchive_CompressionPolicy:
+    # rules is a list of (glob pattern, level) where the first match wins, patterns without a / are matched against the file name.
+    # "store" uses the fastest level, segments in a compressed archive always have to be valid lzo data.
+    def __init__(self, level = 9, rules = None, detectIncompressible = True):
+        self.level = level
+        self.rules = [(globToRegex(normalizePath(pattern)), "/" in pattern, level) for pattern, level in ([] if rules == None else rules)]
+        self.detectIncompressible = detectIncompressible # segments that do not get smaller at the fastest level are stored like that
+    
+    def getLevel(self, path):
+        key = normalizePath(path)
+        for regex, matchPath, level in self.rules:
+            if regex.match(key if matchPath else key.rsplit("/", 1)[-1]):
+                return(1 if level == "store" else level)
+        return(1 if self.level == "store" else self.level)
+
+def globToRegex(pattern): # * and ? do not match /, ** matches any number of directories
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        c = pattern[i]
+        end = pattern.find("]", i+2) if c == "[" else -1
+        if c == "*": regex += "[^/]*"
+        elif c == "?": regex += "[^/]"
+        elif end != -1:
+            charSet = pattern[i+1:end]
+            regex += "[" + ("^"+charSet[1:] if charSet[0] == "!" else charSet).replace("\\", "\\\\") + "]"
+            i = end
+        else: regex += re.escape(c)
+        i += 1
+    return(re.compile(regex + r"\Z", re.DOTALL))
+
+class RefractorFlatArchive_PathQueries: # listDir, walk and glob for classes with getSortedKeys() and getCorrectFilePath()
+    def getKeyRange(self, prefix): # (start, end) in the sorted keys of all paths starting with prefix
+        sortedKeys = self.getSortedKeys()
+        start = bisect.bisect_left(sortedKeys, prefix)
+        if prefix == "":
+            return((start, len(sortedKeys)))
+        return((start, bisect.bisect_left(sortedKeys, prefix[:-1]+chr(ord(prefix[-1])+1), start)))
+    
+    def listDirEntries(self, directory = ""): # returns (dirnames, filenames) directly inside directory
+        sortedKeys = self.getSortedKeys()
+        directory = normalizePath(directory).strip("/")
+        prefix = directory+"/" if directory != "" else ""
+        depth = prefix.count("/")
+        dirnames = []
+        filenames = []
+        i, end = self.getKeyRange(prefix)
+        while i < end:
+            name = sortedKeys[i][len(prefix):]
+            path = self.getCorrectFilePath(sortedKeys[i]).replace("\\", "/").split("/")
+            if "/" in name: # skip the whole subdirectory
+                dirnames.append(path[depth])
+                i = self.getKeyRange(prefix+name.split("/")[0]+"/")[1]
+            else:
+                filenames.append(path[depth])
+                i += 1
+        return((dirnames, filenames))
+    
+    def listDir(self, directory = ""):
+        dirnames, filenames = self.listDirEntries(directory)
+        return(dirnames+filenames)
+    
+    def walk(self, top = ""): # like os.walk, directories are visited top down
+        dirnames, filenames = self.listDirEntries(top)
+        top = top.replace("\\", "/").strip("/")
+        yield((top, dirnames, filenames))
+        for dirname in dirnames:
+            yield from self.walk(top+"/"+dirname if top != "" else dirname)
+    
+    def glob(self, pattern): # case insensitive, only the keys starting with the part before the first wildcard are matched
+        pattern = normalizePath(pattern)
+        regex = globToRegex(pattern)
+        sortedKeys = self.getSortedKeys()
+        start, end = self.getKeyRange(re.split(r"[*?\[]", pattern, maxsplit = 1)[0])
+        return([self.getCorrectFilePath(key) for key in sortedKeys[start:end] if regex.match(key)])
+
+class RefractorFlatArchive(RefractorFlatArchive_PathQueries):
+    def __init__(self, path, read = True, indexCacheDir = None): # indexCacheDir stores the parsed file list of the archive for the next run
         self.path = path
+        self.indexCacheDir = indexCacheDir
         self.compressed = False
         self.success = False
-        self.fileList = []
+        self.fileList = RefractorFlatArchive_FileList()
         self.fileListExternal = []
+        self.segmentTables = {} # doffset -> (segment table, uncompressed start of every segment), used for random access
+        self.cache = None # RefractorFlatArchive_Cache for decompressed segments
+        self.cacheStamp = None # (absolute path, mtime, size) of the archive for cache keys
         self.fileSize = None
+        self.mmap = None # set while the archive is opened with open() or used as a context manager
+        self.view = None
+        self.stats = None # RefractorFlatArchive_Stats, set by enableStats
         if read:
             self.read()
     
-    def read(self):
+    def __enter__(self):
+        return(self.open())
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def enableStats(self, hook = None, slowestEntries = 10): # starts recording I/O counters, returns the RefractorFlatArchive_Stats
+        self.stats = RefractorFlatArchive_Stats(hook, slowestEntries)
+        return(self.stats)
+    
+    def getStats(self):
+        return(None if self.stats == None else self.stats.getStats())
+    
+    def openArchiveFile(self):
+        if self.stats != None: self.stats.add(opens = 1)
+        return(open(self.path, 'rb'))
+    
+    def countRead(self, size):
+        if self.stats != None: self.stats.add(bytesRead = size)
+    
+    def decompress(self, data, ucsize):
+        if self.stats == None:
+            return(decompressSegment(data, ucsize))
+        timeStart = time.perf_counter()
+        segment = decompressSegment(data, ucsize)
+        self.stats.add(segmentsDecompressed = 1, bytesDecompressed = len(segment), timeDecompress = time.perf_counter()-timeStart)
+        return(segment)
+    
+    def open(self): # map the archive into memory, extractions will read from the mapping instead of reopening the file
+        if self.mmap == None:
+            self.cacheStamp = None
+            self.segmentTables = {}
+            with self.openArchiveFile() as f:
+                self.mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            self.view = memoryview(self.mmap)
+        return(self)
+    
+    def close(self):
+        self.fileList.releaseIndexCache()
+        if self.view != None:
+            self.view.release()
+            self.view = None
+        if self.mmap != None:
+            try: self.mmap.close()
+            except BufferError: pass # views returned by extractView are still alive, the mapping is freed once they are released
+            self.mmap = None
+    
+    def read(self): # the archive may have been rewritten since the last read, segment tables and cache keys are taken again
+        self.cacheStamp = None
+        self.segmentTables = {}
         try:
-            with open(self.path, 'rb') as f:
-                f.seek(0,2)
-                self.fileSize = f.tell()
-                f.seek(0)
-                if self.fileSize >= 28:
-                    if not read_s(f, 28) in ["Refractor2 FlatArchive 1.1  "]: # v 1.1 has an additional string of 28 bytes at the start
-                        f.seek(0)
-                offset = read_i(f)
-                self.compressed = read_i(f) == 1
-                f.seek(offset)
-                rfaEntries = read_i(f)
-                for i in range(rfaEntries):
-                    entryPath = read_s(f)
-                    file_info = RefractorFlatArchive_Info(f)
-                    unknowns = read_i(f,3)
-                    self.fileList.append((entryPath, file_info))
-                    self.success = True
+            if self.indexCacheDir != None and self.loadIndexCache():
+                return
+            self.readFileList()
+            if self.indexCacheDir != None:
+                self.saveIndexCache()
         except: pass
     
+    def readFileList(self): # like read, but raises if the archive is damaged, returns the offset of the file list
+        with self.openArchiveFile() as f:
+            self.fileSize = os.fstat(f.fileno()).st_size
+            header = f.read(len(RFA_HEADER_V11)+RFA_HEADER.size)
+            offset, compressed = RFA_HEADER.unpack_from(header, len(RFA_HEADER_V11) if header.startswith(RFA_HEADER_V11) else 0)
+            if offset > self.fileSize:
+                raise ValueError("file list exceeds archive")
+            self.compressed = compressed == 1
+            f.seek(offset)
+            toc = f.read() # the file list is parsed from a single read
+        self.countRead(len(header)+len(toc))
+        self.parseFileList(toc)
+        return(offset)
+    
+    def getIndexCachePath(self):
+        return(os.path.join(self.indexCacheDir, hashlib.sha1(os.path.abspath(self.path).encode("utf-8")).hexdigest()+".rfaidx"))
+    
+    def saveIndexCache(self):
+        fileList = self.fileList
+        stat = os.stat(self.path)
+        archivePath = os.path.abspath(self.path).encode("utf-8")
+        hashTable = fileList.buildHashTable()
+        os.makedirs(self.indexCacheDir, exist_ok = True)
+        indexCachePath = self.getIndexCachePath()
+        tempPath = indexCachePath+".%d.tmp" % os.getpid() # processes reading the same archive do not write into each other's file
+        with open(tempPath, 'wb') as f:
+            f.write(RFA_INDEX_HEADER.pack(RFA_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, 1 if self.compressed else 0, len(fileList.alive), len(hashTable), len(fileList.pathBlob), len(archivePath)))
+            f.write(archivePath + b"\0"*(-len(archivePath)%4))
+            for column in [fileList.pathStart, fileList.pathLength, fileList.csize, fileList.ucsize, fileList.doffset, hashTable]:
+                f.write(column)
+            f.write(fileList.pathBlob)
+        os.replace(tempPath, indexCachePath)
+    
+    def loadIndexCache(self): # returns False if there is no cache file or it is outdated
+        self.cacheStamp = None
+        self.segmentTables = {}
+        try:
+            stat = os.stat(self.path)
+            with open(self.getIndexCachePath(), 'rb') as f:
+                indexCache = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except OSError:
+            return(False)
+        try: magic, size, mtime, compressed, count, tableSize, pathBlobSize, archivePathSize = RFA_INDEX_HEADER.unpack_from(indexCache)
+        except struct.error:
+            indexCache.close()
+            return(False)
+        position = RFA_INDEX_HEADER.size
+        archivePath = indexCache[position:position+archivePathSize]
+        position += archivePathSize + (-archivePathSize%4)
+        if magic != RFA_INDEX_MAGIC or size != stat.st_size or mtime != stat.st_mtime_ns or archivePath != os.path.abspath(self.path).encode("utf-8") or len(indexCache) != position+4*(5*count+tableSize)+pathBlobSize:
+            indexCache.close()
+            return(False)
+        view = memoryview(indexCache)
+        columns = []
+        for length in [count]*5+[tableSize]:
+            columns.append(view[position:position+4*length].cast('I'))
+            position += 4*length
+        fileList = RefractorFlatArchive_FileList(view[position:position+pathBlobSize])
+        fileList.pathStart, fileList.pathLength, fileList.csize, fileList.ucsize, fileList.doffset, fileList.hashTable = columns
+        fileList.alive = bytearray(b"\1")*count
+        fileList.count = count
+        fileList.indexCache = indexCache
+        self.fileList = fileList
+        self.fileSize = size
+        self.compressed = compressed == 1
+        self.success = count > 0
+        return(True)
+    
+    def parseFileList(self, toc):
+        unpackUInt = RFA_UINT.unpack_from
+        unpackEntry = RFA_ENTRY.unpack_from
+        self.fileList = RefractorFlatArchive_FileList(toc) # the paths stay in the file list data
+        add = self.fileList.add
+        rfaEntries = unpackUInt(toc, 0)[0]
+        position = 4
+        for i in range(rfaEntries):
+            length = unpackUInt(toc, position)[0]
+            position += 4
+            if position+length > len(toc):
+                raise ValueError("file list exceeds archive")
+            csize, ucsize, doffset, unknown1, unknown2, unknown3 = unpackEntry(toc, position+length)
+            add(position, length, csize, ucsize, doffset)
+            position += length+RFA_ENTRY.size
+            self.success = True
+    
+    @property
+    def fileIndex(self): # normalized path -> row in fileList
+        return(self.fileList.getIndex())
+    
     def getFileList(self):
-        filePathList = [fileInfo[0] for fileInfo in self.fileList]
-        return(filePathList)
+        return(self.fileList.paths())
+    
+    def findRow(self, key): # key is a normalized path
+        return(self.fileList.find(key))
+    
+    def getFileInfo(self, path):
+        row = self.findRow(normalizePath(path))
+        return(None if row == None else self.fileList.entry(row))
+    
+    def getSortedKeys(self):
+        return(self.fileList.getSortedKeys())
     
     def getCorrectFilePath(self, path):
-        for fileInfo in self.fileList:
-            if fileInfo[0].lower().replace('\\', '/') == path.lower().replace('\\', '/'):
-                return(fileInfo[0])
-        return(None)
+        fileInfo = self.getFileInfo(path)
+        return(None if fileInfo == None else fileInfo[0])
+    
+    def readSegmentTable(self, fileInfo, f = None): # returns (csize, ucsize, offset) for every segment of a compressed entry, offsets are relative to the end of the table
+        doffset = fileInfo[1].doffset
+        if fileInfo[1].csize == 0: # no data stored, not even the segment count
+            return([])
+        if self.view == None and f == None:
+            with self.openArchiveFile() as f:
+                return(self.readSegmentTable(fileInfo, f))
+        if self.view != None:
+            segment_num = RFA_UINT.unpack_from(self.view, doffset)[0]
+        else:
+            f.seek(doffset)
+            segment_num = read_i(f)
+        if 4+3*4*segment_num > fileInfo[1].csize: # a damaged count would otherwise read far beyond the entry
+            raise ValueError("segment table exceeds entry: "+fileInfo[0])
+        if self.view != None:
+            segmentTable = uintStruct(3*segment_num).unpack_from(self.view, doffset+4)
+        else:
+            segmentTable = read_i(f, 3*segment_num, True)
+        self.countRead(4+3*4*segment_num)
+        return([segmentTable[3*i:3*i+3] for i in range(segment_num)])
+    
+    def getSegmentIndex(self, fileInfo, f = None):
+        segmentIndex = self.segmentTables.get(fileInfo[1].doffset)
+        if segmentIndex == None:
+            segmentTable = self.readSegmentTable(fileInfo, f)
+            segmentStarts = []
+            start = 0
+            for csize, ucsize, offset in segmentTable:
+                segmentStarts.append(start)
+                start += ucsize
+            segmentIndex = self.segmentTables[fileInfo[1].doffset] = (segmentTable, segmentStarts)
+        return(segmentIndex)
+    
+    def getCacheKey(self, fileInfo): # the modification time and size of the archive make sure a replaced archive does not hit old segments
+        if self.cache == None:
+            return(None)
+        if self.cacheStamp == None: # taken once per read or open, not for every segment
+            stat = os.stat(self.path)
+            self.cacheStamp = (os.path.abspath(self.path), stat.st_mtime_ns, stat.st_size)
+        return(self.cacheStamp+(fileInfo[1].doffset,))
+    
+    def decompressSegmentCached(self, cacheKey, index, data, ucsize):
+        if cacheKey == None:
+            return(self.decompress(data, ucsize))
+        segment = self.cache.get(cacheKey+(index,))
+        if segment == None:
+            segment = self.decompress(data, ucsize)
+            self.cache.put(cacheKey+(index,), segment)
+        return(segment)
+    
+    def readSegment(self, fileInfo, index, segmentMemo = None, files = None): # decompresses a single segment, segmentMemo (a dict) keeps the last one, files (a list) holds the archive once it had to be opened
+        if segmentMemo != None and index in segmentMemo:
+            return(segmentMemo[index])
+        cacheKey = self.getCacheKey(fileInfo)
+        if cacheKey != None:
+            data = self.cache.get(cacheKey+(index,))
+            if data != None:
+                if segmentMemo != None:
+                    segmentMemo.clear()
+                    segmentMemo[index] = data
+                return(data)
+        segmentTable = self.getSegmentIndex(fileInfo)[0]
+        csize, ucsize, offset = segmentTable[index]
+        dataStart = fileInfo[1].doffset+4+3*4*len(segmentTable)+offset
+        if self.view != None:
+            data = self.view[dataStart:dataStart+csize]
+        elif files != None:
+            if not files:
+                files.append(self.openArchiveFile())
+            files[0].seek(dataStart)
+            data = files[0].read(csize)
+        else:
+            with self.openArchiveFile() as f:
+                f.seek(dataStart)
+                data = f.read(csize)
+        self.countRead(len(data))
+        if len(data) != csize:
+            raise ValueError("segment exceeds archive: "+fileInfo[0])
+        data = self.decompress(data, ucsize)
+        if cacheKey != None: # the miss was already counted above
+            self.cache.put(cacheKey+(index,), data)
+        if segmentMemo != None:
+            segmentMemo.clear()
+            segmentMemo[index] = data
+        return(data)
+    
+    def readBlockRange(self, fileInfo, offset, length = None, segmentMemo = None): # only decompresses the segments that cover the range
+        end = fileInfo[1].ucsize if length == None else min(fileInfo[1].ucsize, offset+length)
+        if offset >= end:
+            return(b"")
+        if not self.compressed:
+            start = fileInfo[1].doffset+offset
+            self.countRead(end-offset)
+            if self.view != None:
+                return(bytes(self.view[start:start+end-offset]))
+            with self.openArchiveFile() as f:
+                f.seek(start)
+                return(f.read(end-offset))
+        files = [] # the archive is opened at most once for the whole range, and not at all if every segment is memoized or cached
+        try:
+            if self.view == None and not fileInfo[1].doffset in self.segmentTables:
+                files.append(self.openArchiveFile())
+            segmentTable, segmentStarts = self.getSegmentIndex(fileInfo, files[0] if files else None)
+            index = max(0, bisect.bisect_right(segmentStarts, offset)-1)
+            data = []
+            while index < len(segmentTable) and segmentStarts[index] < end:
+                segmentStart = segmentStarts[index]
+                data.append(self.readSegment(fileInfo, index, segmentMemo, files)[max(0, offset-segmentStart):end-segmentStart])
+                index += 1
+        finally:
+            for f in files:
+                f.close()
+        return(b"".join(data))
+    
+    def readRange(self, path, offset, length = None):
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            raise FileNotFoundError(path)
+        return(self.readBlockRange(fileInfo, offset, length))
+    
+    def openFile(self, path): # returns a read only file object for an entry
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            raise FileNotFoundError(path)
+        return(RefractorFlatArchive_File(self, fileInfo))
+    
+    def iterSegmentsRaw(self, fileInfo): # yields (compressed data, uncompressed size) for every segment of a compressed entry
+        if self.view != None:
+            segmentTable = self.readSegmentTable(fileInfo)
+            dataStart = fileInfo[1].doffset+4+3*4*len(segmentTable)
+            for csize, ucsize, offset in segmentTable:
+                data = self.view[dataStart+offset:dataStart+offset+csize]
+                self.countRead(len(data))
+                if len(data) != csize:
+                    raise ValueError("segment exceeds archive: "+fileInfo[0])
+                yield((data, ucsize))
+            return
+        with self.openArchiveFile() as f:
+            segmentTable = self.readSegmentTable(fileInfo, f)
+            dataStart = fileInfo[1].doffset+4+3*4*len(segmentTable)
+            for csize, ucsize, offset in segmentTable:
+                f.seek(dataStart + offset)
+                data = f.read(csize)
+                self.countRead(len(data))
+                if len(data) != csize:
+                    raise ValueError("segment exceeds archive: "+fileInfo[0])
+                yield((data, ucsize))
     
-    def extractBlock(self, fileInfo, destinationPath = None, asBytes = False):
+    def iterBlockUncompressed(self, fileInfo): # uncompressed entries are returned as a single view while the archive is mapped
+        doffset = fileInfo[1].doffset
+        if self.view != None:
+            if doffset+fileInfo[1].ucsize > len(self.view):
+                raise ValueError("entry exceeds archive: "+fileInfo[0])
+            self.countRead(fileInfo[1].ucsize)
+            yield(self.view[doffset:doffset+fileInfo[1].ucsize])
+            return
+        with self.openArchiveFile() as f:
+            f.seek(doffset)
+            remaining = fileInfo[1].ucsize
+            while remaining > 0:
+                data = f.read(min(remaining, RFA_SEGMENT_SIZE))
+                if len(data) == 0:
+                    raise ValueError("entry exceeds archive: "+fileInfo[0])
+                self.countRead(len(data))
+                remaining -= len(data)
+                yield(data)
+    
+    def iterBlock(self, fileInfo, executor = None): # yields the decompressed segments one by one, an executor decompresses them in parallel
+        if not self.compressed:
+            yield from self.iterBlockUncompressed(fileInfo)
+        elif executor == None:
+            cacheKey = self.getCacheKey(fileInfo)
+            for index, (data, ucsize) in enumerate(self.iterSegmentsRaw(fileInfo)):
+                yield(self.decompressSegmentCached(cacheKey, index, data, ucsize))
+        else:
+            pending = collections.deque()
+            maxPending = 2*(os.cpu_count() or 1)
+            for data, ucsize in self.iterSegmentsRaw(fileInfo):
+                pending.append(executor.submit(self.decompress, data, ucsize))
+                if len(pending) >= maxPending:
+                    yield(pending.popleft().result())
+            while pending:
+                yield(pending.popleft().result())
+    
+    def iterFile(self, path):
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            raise FileNotFoundError(path)
+        return(self.iterBlock(fileInfo))
+    
+    def readBlock(self, fileInfo): # reads a whole entry through a single open of the archive and raises on errors, single segment entries (or views on the mapping) are not copied
+        timeStart = time.perf_counter()
+        segments = self.iterBlock(fileInfo)
+        data = next(segments, b"")
+        for data_segment in segments:
+            if not isinstance(data, bytearray): data = bytearray(data)
+            data += data_segment
+        if self.stats != None: self.stats.addEntry(self.path, fileInfo[0], fileInfo[1].ucsize, time.perf_counter()-timeStart)
+        return(data)
+    
+    def readFile(self, path): # the bytes of an entry, raises FileNotFoundError and on damaged entries
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            raise FileNotFoundError(path)
+        return(bytes(self.readBlock(fileInfo)))
+    
+    def extractBlock(self, fileInfo, destinationPath = None, asBytes = False, asView = False):
         self.success = False
         try:
-            with open(self.path, 'rb') as f:
-                data = []
-                f.seek(fileInfo[1].doffset)
-                if not self.compressed:
-                    data = [f.read(fileInfo[1].ucsize)]
-                else:
-                    segment_num = read_i(f)
-                    for i in range(segment_num):
-                        f.seek(fileInfo[1].doffset+4+3*4*i)
-                        segment_info = RefractorFlatArchive_Info(f)
-                        if segment_info.csize == 0 or segment_info.ucsize == 0:
-                            data.append(b'')
-                        else:
-                            f.seek(fileInfo[1].doffset+4+3*4*segment_num + segment_info.doffset)
-                            data_compressed = f.read(segment_info.csize)
-                            data.append(lzo.decompress(data_compressed, False, segment_info.ucsize))
-                if data != []:
-                    if destinationPath == None:
-                        self.success = True
-                        ret_str = b"" if asBytes else ""
-                        for data_segment in data: ret_str += data_segment if asBytes else data_segment.decode("utf-8", errors="ignore")
-                        return(ret_str)
-                    dir = os.path.dirname(destinationPath)
-                    if not os.path.exists(dir):
-                        os.makedirs(dir)
-                    with open(destinationPath, 'wb') as fout:
-                        fout.truncate()
-                        self.success = True
-                        for data_segment in data:
-                            fout.write(data_segment)
-        except: pass
+            if destinationPath == None:
+                data = self.readBlock(fileInfo)
+                self.success = True
+                if asView:
+                    return(memoryview(data))
+                if asBytes:
+                    return(bytes(data))
+                return(str(data, "utf-8", errors="ignore"))
+            self.extractEntry(fileInfo, destinationPath)
+            self.success = True
+        except Exception as e:
+            if self.stats != None: self.stats.addError(self.path, fileInfo[0], e)
         return(False)
     
-    def extractAll(self, destinationDir = None):
-        for fileInfo in self.fileList:
-            destinationPath = fileInfo[0] if destinationDir == None else os.path.join(destinationDir, fileInfo[0])
-            self.extractBlock(fileInfo, destinationPath)
+    def extractEntry(self, fileInfo, destinationPath, executor = None): # like extractBlock, but raises on errors
+        dir = os.path.dirname(destinationPath)
+        if dir != "":
+            os.makedirs(dir, exist_ok = True)
+        timeStart = time.perf_counter()
+        with open(destinationPath, 'wb') as fout:
+            try:
+                for data_segment in self.iterBlock(fileInfo, executor):
+                    fout.write(data_segment)
+            except:
+                fout.close()
+                os.remove(destinationPath) # dont leave a partially written file behind
+                raise
+        if self.stats != None: self.stats.addEntry(self.path, fileInfo[0], fileInfo[1].ucsize, time.perf_counter()-timeStart)
+    
+    def verifyEntry(self, fileInfo, dataEnd = None): # decompresses every segment without writing anything, returns a report dict, error is None for intact entries
+        info = fileInfo[1]
+        report = {"path": fileInfo[0], "csize": info.csize, "ucsize": info.ucsize, "segments": 0, "error": None}
+        try:
+            if dataEnd == None: dataEnd = len(self.view) if self.view != None else os.path.getsize(self.path)
+            if info.doffset+info.csize > dataEnd:
+                raise ValueError("entry exceeds archive")
+            if not self.compressed:
+                if info.csize != info.ucsize:
+                    raise ValueError("stored size %d differs from uncompressed size %d" % (info.csize, info.ucsize))
+                for data in self.iterBlockUncompressed(fileInfo):
+                    pass
+            else:
+                segmentTable = self.readSegmentTable(fileInfo)
+                dataSize = info.csize-(4+3*4*len(segmentTable)) if len(segmentTable) > 0 else 0
+                ucsize = 0
+                for csize_segment, ucsize_segment, offset in segmentTable:
+                    if offset+csize_segment > dataSize:
+                        raise ValueError("segment %d exceeds entry" % report["segments"])
+                    ucsize += ucsize_segment
+                if ucsize != info.ucsize:
+                    raise ValueError("segments add up to %d bytes instead of %d" % (ucsize, info.ucsize))
+                for data, ucsize_segment in self.iterSegmentsRaw(fileInfo):
+                    if len(self.decompress(data, ucsize_segment)) != ucsize_segment:
+                        raise ValueError("segment %d decompressed to the wrong size" % report["segments"])
+                    report["segments"] += 1
+        except Exception as e:
+            report["error"] = "%s: %s" % (type(e).__name__, e)
+        return(report)
+    
+    def verify(self, workers = 1): # checks the archive on disk, see verifyArchives
+        return(verifyArchives([self.path], workers)[self.path])
+    
+    def getFingerprint(self, fileInfo): # hash of the stored data, changes whenever the contents change without decompressing them
+        hasher = hashlib.blake2b(digest_size = 16)
+        if not self.compressed:
+            for data in self.iterBlockUncompressed(fileInfo):
+                hasher.update(data)
+        else:
+            for data, ucsize in self.iterSegmentsRaw(fileInfo):
+                hasher.update(RFA_UINT.pack(ucsize))
+                hasher.update(data)
+        return(hasher.hexdigest())
+    
+    def extractAll(self, destinationDir = None, workers = 1, processes = False, sync = False, deleteStale = False): # returns a list of (path, exception) for files that failed
+        entries = [(self, fileInfo, fileInfo[0] if destinationDir == None else os.path.join(destinationDir, fileInfo[0])) for fileInfo in self.fileList]
+        if sync: # skips files that are unchanged since the last sync, deleteStale removes synced files that are gone from the archive
+            return(syncEntries(entries, destinationDir, workers, processes, deleteStale, [self.path]))
+        return(extractEntries(entries, workers, processes))
 
     def extractFile(self, path, destinationDir = None, asString = False):
-        path = self.getCorrectFilePath(path)
-        destinationPath = path if destinationDir == None else os.path.join(destinationDir, path)
-        for fileInfo in self.fileList:
-            if fileInfo[0] == path:
-                return(self.extractBlock(fileInfo, None if asString else destinationPath))
-        return(False)
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            return(False)
+        destinationPath = fileInfo[0] if destinationDir == None else os.path.join(destinationDir, fileInfo[0])
+        return(self.extractBlock(fileInfo, None if asString else destinationPath))
+    
+    def extractView(self, path): # returns a memoryview, without copying for uncompressed archives that are opened
+        fileInfo = self.getFileInfo(path)
+        if fileInfo == None:
+            return(False)
+        return(self.extractBlock(fileInfo, asView = True))
+    
+    def removeFile(self, path): # removes an internal file, returns True if it was found
+        return(self.fileList.remove(normalizePath(path)))
     
     def addFile(self, filePath, base_directory):
         relativePath = os.path.relpath(filePath, base_directory)
-        for file in self.fileList:
-            if file[0].lower() == relativePath.lower():
-                self.fileList.remove(file)
+        self.removeFile(relativePath)
         self.fileListExternal.append([relativePath, False, filePath])
         
     def addFileAsSring(self, relativePath, contents):
-        for file in self.fileList:
-            if file[0].lower() == relativePath.lower():
-                self.fileList.remove(file)
+        self.removeFile(relativePath)
         self.fileListExternal.append([relativePath, True, contents])
     
     def addDirectory(self, directory, base_directory = None):
@@ -141,7 +1144,104 @@ class RefractorFlatArchive:
         for file in files:
             self.addFile(file, base_directory)
     
-    def write(self, destPath = None, compressed = True):
+    def openSource(self, file): # returns (size, iterator over chunks of RFA_SEGMENT_SIZE) for an entry of fileList or fileListExternal
+        if len(file) == 2: #internal RFA file
+            return((file[1].ucsize, iterChunks(self.iterBlock(file))))
+        if file[1]: #content as string
+            fileBytes = bytes(file[2], "UTF-8")
+            return((len(fileBytes), (fileBytes[i:i+RFA_SEGMENT_SIZE] for i in range(0, len(fileBytes), RFA_SEGMENT_SIZE))))
+        return((os.path.getsize(file[2]), iterFileChunks(file[2])))
+    
+    def copyEntryRaw(self, f, fileInfo): # copies the compressed segments of an internal entry without recompressing them, returns (csize, ucsize)
+        segment_num = len(self.readSegmentTable(fileInfo))
+        dataOffset = f.tell()
+        write_i(f, segment_num) #number of segments
+        write_i(f, [0]*segment_num*3) #segments header pre-fill
+        startDataBlocks = f.tell()
+        segmentInfos = []
+        for data, ucsize_segment in self.iterSegmentsRaw(fileInfo):
+            segmentInfos.append(RefractorFlatArchive_Info(None, len(data), ucsize_segment, f.tell()-startDataBlocks))
+            f.write(data)
+        endDataBlocks = f.tell()
+        f.seek(dataOffset+4)
+        for segmentInfo in segmentInfos: # offsets are rewritten, segments are now stored back to back
+            segmentInfo.write(f)
+        f.seek(endDataBlocks)
+        return((endDataBlocks-dataOffset, fileInfo[1].ucsize))
+    
+    def getContentKey(self, file, rawCopy): # identifies the data block an entry will be written as before it is compressed, None if it can only be hashed while writing
+        hasher = hashlib.sha1()
+        if rawCopy: # the compressed segments that will be copied
+            for data, ucsize_segment in self.iterSegmentsRaw(file):
+                hasher.update(RFA_UINT.pack(ucsize_segment))
+                hasher.update(data)
+            return(("raw", file[1].ucsize, hasher.digest()))
+        if len(file) == 2: # would have to be decompressed twice
+            return(None)
+        for chunk in self.openSource(file)[1]: # hashing a loose file or string a second time is far cheaper than compressing a duplicate
+            hasher.update(chunk)
+        return(("data", hasher.digest()))
+    
+    def writeEntry(self, f, file, compressed, executor = None, passthrough = True, hasher = None, policy = None): # writes the data block of an entry at the current position, returns (csize, ucsize), hasher is updated with the data as it is written
+        if len(file) == 2 and compressed and self.compressed and passthrough:
+            return(self.copyEntryRaw(f, file))
+        size, chunks = self.openSource(file)
+        if hasher != None:
+            chunks = hashChunks(chunks, hasher)
+        if not compressed:
+            ucsize = 0
+            for chunk in chunks:
+                ucsize += f.write(chunk)
+            csize = ucsize
+        else:
+            segment_num = (size+RFA_SEGMENT_SIZE-1)//RFA_SEGMENT_SIZE
+            dataOffset = f.tell()
+            write_i(f, segment_num) #number of segments
+            write_i(f, [0]*segment_num*3) #segments header pre-fill
+            startDataBlocks = f.tell()
+            segmentInfos = []
+            level = 9 if policy == None else policy.getLevel(file[0])
+            for ucsize_segment, fileBytesCompressed in compressChunks(chunks, executor, level, policy != None and policy.detectIncompressible, self.stats):
+                segmentInfos.append(RefractorFlatArchive_Info(None, len(fileBytesCompressed), ucsize_segment, f.tell()-startDataBlocks))
+                f.write(fileBytesCompressed)
+            if len(segmentInfos) != segment_num:
+                raise ValueError("size changed while writing: "+file[0])
+            ucsize = sum(segmentInfo.ucsize for segmentInfo in segmentInfos)
+            endDataBlocks = f.tell()
+            csize = endDataBlocks-dataOffset
+            f.seek(dataOffset+4)
+            for segmentInfo in segmentInfos:
+                segmentInfo.write(f)
+            f.seek(endDataBlocks)
+        if ucsize != size:
+            raise ValueError("size changed while writing: "+file[0])
+        return((csize, ucsize))
+    
+    def compressionReport(self, policy = None): # compresses everything write() would compress without writing, returns sizes and times per extension for the policy and for level 9
+        if policy == None: policy = RefractorFlatArchive_CompressionPolicy()
+        report = {}
+        for file in list(self.fileList) + self.fileListExternal:
+            extension = os.path.splitext(file[0])[1].lower()
+            level = policy.getLevel(file[0])
+            for key in [extension, "total"]:
+                report.setdefault(key, {"files": 0, "ucsize": 0, "csize": 0, "time": 0.0, "csize_level9": 0, "time_level9": 0.0})["files"] += 1
+            for chunk in self.openSource(file)[1]:
+                timeStart = time.perf_counter()
+                csize = len(compressSegment(chunk, level, policy.detectIncompressible))
+                timePolicy = time.perf_counter()-timeStart
+                timeStart = time.perf_counter()
+                csize_level9 = len(compressSegment(chunk))
+                time_level9 = time.perf_counter()-timeStart
+                for key in [extension, "total"]:
+                    stats = report[key]
+                    stats["ucsize"] += len(chunk)
+                    stats["csize"] += csize
+                    stats["time"] += timePolicy
+                    stats["csize_level9"] += csize_level9
+                    stats["time_level9"] += time_level9
+        return(report)
+    
+    def write(self, destPath = None, compressed = True, workers = 1, processes = False, passthrough = True, dedup = False, policy = None): # passthrough copies compressed entries of this archive without recompressing them, dedup stores identical files once
         overWriteSelf = destPath == None
         if destPath == None: destPath = self.path+"tmp"
         
@@ -165,50 +1265,50 @@ class RefractorFlatArchive:
             0xA3, 0x4D, 0x8C, 0x08, 0x17, 0xD3, 0x98, 0x00, 0x4B, 0xD0, 0x12, 0x48]
             write_bytes(f, header_unknown)
             
-            fileListTotal = self.fileList + self.fileListExternal
+            fileListTotal = list(self.fileList) + self.fileListExternal
             fileListTotal.sort(key=file_key)
             
             file_infos = []
+            dataBlocks = {} # content key -> (csize, ucsize, dataOffset) of blocks already written, for dedup
+            stats = {"files": 0, "duplicates": 0, "bytesSaved": 0}
             # write file_blocks
-            for file in fileListTotal:
-                if len(file) == 3: #external file
-                    if file[1]: #content as string
-                        fileBytes = bytes(file[2], "UTF-8")
-                    else:
-                        try:
-                            with open(file[1], "rb") as f_source:
-                                fileBytes = f_source.read()
-                        except:
-                            print("cant open: "+file[1])
-                            break
-                else: #internal RFA file
-                    fileBytes = self.extractBlock(file, asBytes = True)
-                    if fileBytes == False:
-                        print("cant open: "+file[0]+" in RFA")
+            executor = None
+            if workers > 1:
+                executor = concurrent.futures.ProcessPoolExecutor(workers) if processes else concurrent.futures.ThreadPoolExecutor(workers)
+            try:
+                for file in fileListTotal:
+                    dataOffset = f.tell()
+                    try:
+                        contentKey = hasher = None
+                        if dedup: # duplicates are found before they are compressed, only entries of this archive that are recompressed are hashed while writing
+                            contentKey = self.getContentKey(file, len(file) == 2 and compressed and self.compressed and passthrough)
+                            if contentKey == None: hasher = hashlib.sha1()
+                        if contentKey in dataBlocks:
+                            csize, ucsize, dataOffset = dataBlocks[contentKey]
+                        else:
+                            csize, ucsize = self.writeEntry(f, file, compressed, executor, passthrough, hasher, policy)
+                            if hasher != None:
+                                contentKey = ("data", hasher.digest())
+                                if contentKey in dataBlocks: # only known after writing, drop the copy again
+                                    f.seek(dataOffset)
+                                    f.truncate()
+                                    csize, ucsize, dataOffset = dataBlocks[contentKey]
+                    except:
+                        print("cant open: "+(file[0]+" in RFA" if len(file) == 2 else file[0]))
+                        f.seek(dataOffset)
+                        f.truncate()
                         break
-                dataOffset = f.tell()
-                if not compressed: #not compressed
-                    f.write(fileBytes)
-                    csize = len(fileBytes)
-                else:
-                    maxSegmentSize = 32768
-                    fileBytesBlocks = [fileBytes[i:min(i + maxSegmentSize, len(fileBytes))] for i in range(0, len(fileBytes), maxSegmentSize)]
-                    write_i(f, len(fileBytesBlocks)) #number of segments
-                    write_i(f, [0]*len(fileBytesBlocks)*3) #segments header pre-fill
-                    startDataBlocks = f.tell()
-                    segmentInfos = []
-                    csize = len(fileBytesBlocks)*3*4+4
-                    for fileBytesBlock in fileBytesBlocks:
-                        fileBytesCompressed = lzo.compress(fileBytesBlock, 9, False) #compression level = 9, Include metadata header = False
-                        segmentInfos.append(RefractorFlatArchive_Info(None, len(fileBytesCompressed), len(fileBytesBlock), f.tell()-startDataBlocks))
-                        f.write(fileBytesCompressed)
-                        csize += len(fileBytesCompressed)
-                    endDataBlocks = f.tell()
-                    f.seek(dataOffset+4)
-                    for segmentInfo in segmentInfos:
-                        segmentInfo.write(f)
-                    f.seek(endDataBlocks)
-                file_infos.append((file[0], RefractorFlatArchive_Info(None, csize, len(fileBytes), dataOffset)))
+                    if dedup:
+                        if contentKey in dataBlocks:
+                            stats["duplicates"] += 1
+                            stats["bytesSaved"] += csize
+                        else:
+                            dataBlocks[contentKey] = (csize, ucsize, dataOffset)
+                    stats["files"] += 1
+                    file_infos.append((file[0], RefractorFlatArchive_Info(None, csize, ucsize, dataOffset)))
+            finally:
+                if executor != None:
+                    executor.shutdown()
             
             startFileList = f.tell()
             
@@ -227,35 +1327,198 @@ class RefractorFlatArchive:
             write_i(f, startFileList)
         
         if overWriteSelf:
+            self.close()
             os.replace(destPath, self.path)
+            self.segmentTables = {}
+            self.cacheStamp = None
+        return(stats)
             
-class RefractorFlatArchiveGroup:
-    def __init__(self, rfas = None):
-        self.rfas = [] if rfas == None else [RefractorFlatArchive(path) for path in rfas]
+class RefractorFlatArchiveGroup(RefractorFlatArchive_PathQueries):
+    def __init__(self, rfas = None, cacheSize = None, indexCacheDir = None): # cacheSize in bytes enables a decompressed segment cache shared by all rfas
+        self.indexCacheDir = indexCacheDir
+        self.rfas = [] if rfas == None else [RefractorFlatArchive(path, indexCacheDir = indexCacheDir) for path in rfas]
+        self.cache = None if cacheSize == None else RefractorFlatArchive_Cache(cacheSize)
+        for rfa in self.rfas:
+            rfa.cache = self.cache
+        self.stats = None # RefractorFlatArchive_Stats shared by all rfas, set by enableStats
+        self.asyncLimit = 4 # extractions running at the same time for aextract/aiterFile
+        self.asyncExecutor = None # executor for aextract/aiterFile, None uses the default executor of the event loop
+        self.asyncSemaphore = None # (event loop, semaphore)
+        self.asyncPending = {} # (event loop, rfa, normalized path) -> future of an extraction in progress
+        self.mergedIndex = None # normalized path -> rfa with the highest priority containing it
+        self.mergedIndexState = None # getIndexState() when mergedIndex was last updated
+        self.sortedKeys = None
+        if indexCacheDir == None:
+            self.rebuildIndex()
+    
+    @property
+    def fileIndex(self): # with an index cache this is only built once the whole file list is needed, single lookups use the index of every rfa
+        if self.mergedIndex == None or self.mergedIndexState != self.getIndexState():
+            self.rebuildIndex()
+        return(self.mergedIndex)
+    
+    def getIndexState(self): # changes whenever a file list of an rfa is replaced, or files are added to or removed from it
+        return([(rfa.fileList, rfa.fileList.changes) for rfa in self.rfas])
+    
+    def __enter__(self):
+        return(self.open())
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def enableStats(self, hook = None, slowestEntries = 10):
+        self.stats = RefractorFlatArchive_Stats(hook, slowestEntries)
+        for rfa in self.rfas:
+            rfa.stats = self.stats
+        return(self.stats)
+    
+    def getStats(self):
+        return(None if self.stats == None else self.stats.getStats())
+    
+    def open(self):
+        for rfa in self.rfas:
+            rfa.open()
+        return(self)
+    
+    def close(self):
+        for rfa in self.rfas:
+            rfa.close()
+    
+    def getSortedKeys(self):
+        fileIndex = self.fileIndex # resets sortedKeys if the index was outdated
+        if self.sortedKeys == None:
+            self.sortedKeys = sorted(fileIndex)
+        return(self.sortedKeys)
+    
+    def rebuildIndex(self):
+        self.sortedKeys = None
+        self.mergedIndex = {}
+        for rfa in self.rfas:
+            for key, row in rfa.fileList.iterKeys():
+                self.mergedIndex.setdefault(key, rfa)
+        self.mergedIndexState = self.getIndexState()
+    
+    def addArchive(self, rfa, priority = None): # rfa can be a path or a RefractorFlatArchive, priority 0 is the most important
+        if not isinstance(rfa, RefractorFlatArchive): rfa = RefractorFlatArchive(rfa, indexCacheDir = self.indexCacheDir)
+        if self.cache != None: rfa.cache = self.cache
+        if self.stats != None: rfa.stats = self.stats
+        if self.mergedIndex != None and self.mergedIndexState != self.getIndexState():
+            self.mergedIndex = None # outdated, rebuilt on the next use
+        self.rfas.insert(len(self.rfas) if priority == None else priority, rfa)
+        self.sortedKeys = None
+        if self.mergedIndex == None:
+            return(rfa)
+        ranks = {id(rfa_group): i for i, rfa_group in enumerate(self.rfas)}
+        rank = ranks[id(rfa)]
+        for key, row in rfa.fileList.iterKeys():
+            current = self.mergedIndex.get(key)
+            if current == None or ranks[id(current)] > rank:
+                self.mergedIndex[key] = rfa
+        self.mergedIndexState = self.getIndexState()
+        return(rfa)
+    
+    def removeArchive(self, rfa): # rfa can be a path or a RefractorFlatArchive
+        for rfa_group in self.rfas:
+            if rfa_group is rfa or rfa_group.path == rfa:
+                rfa = rfa_group
+                break
+        else:
+            return(False)
+        if self.mergedIndex != None and self.mergedIndexState != self.getIndexState():
+            self.mergedIndex = None
+        self.rfas.remove(rfa)
+        self.sortedKeys = None
+        if self.mergedIndex == None:
+            return(True)
+        for key, row in rfa.fileList.iterKeys():
+            if self.mergedIndex.get(key) is rfa:
+                del self.mergedIndex[key]
+                for rfa_group in self.rfas:
+                    if rfa_group.findRow(key) != None:
+                        self.mergedIndex[key] = rfa_group
+                        break
+        self.mergedIndexState = self.getIndexState()
+        return(True)
+    
+    def getArchive(self, path): # returns the rfa that provides path
+        key = normalizePath(path)
+        if self.mergedIndex != None:
+            return(self.fileIndex.get(key))
+        for rfa in self.rfas:
+            if rfa.findRow(key) != None:
+                return(rfa)
+        return(None)
+    
+    def iterFile(self, path):
+        rfa = self.getArchive(path)
+        if rfa == None:
+            raise FileNotFoundError(path)
+        return(rfa.iterFile(path))
+    
+    def readRange(self, path, offset, length = None):
+        rfa = self.getArchive(path)
+        if rfa == None:
+            raise FileNotFoundError(path)
+        return(rfa.readRange(path, offset, length))
+    
+    def openFile(self, path):
+        rfa = self.getArchive(path)
+        if rfa == None:
+            raise FileNotFoundError(path)
+        return(rfa.openFile(path))
         
     def extractFile(self, path, destinationDir = None, asString = False):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None:
-                return(rfa.extractFile(filePathInRFA, destinationDir, asString))
-        return(False)
+        rfa = self.getArchive(path)
+        if rfa == None:
+            return(False)
+        return(rfa.extractFile(path, destinationDir, asString))
     
     def getFileList(self):
-        filePathList = []
-        for rfa in self.rfas:
-            for fileInfo in rfa.fileList:
-                if not fileInfo[0].lower() in (path.lower() for path in filePathList):
-                    filePathList.append(fileInfo[0])
-        return(filePathList)
+        return([rfa.fileList.path(rfa.findRow(key)) for key, rfa in self.fileIndex.items()])
+    
+    async def runAsync(self, function, *args): # runs function in the executor, at most asyncLimit at once
+        loop = asyncio.get_running_loop()
+        if self.asyncSemaphore == None or self.asyncSemaphore[0] is not loop:
+            self.asyncSemaphore = (loop, asyncio.Semaphore(self.asyncLimit))
+        async with self.asyncSemaphore[1]:
+            return(await loop.run_in_executor(self.asyncExecutor, function, *args))
+    
+    async def aextract(self, path, asString = False): # extractFile for asyncio, returns the bytes (or str) and raises FileNotFoundError
+        rfa = self.getArchive(path)
+        if rfa == None:
+            raise FileNotFoundError(path)
+        key = (asyncio.get_running_loop(), id(rfa), normalizePath(path))
+        future = self.asyncPending.get(key)
+        if future == None: # concurrent requests for the same entry share one decompression
+            future = self.asyncPending[key] = asyncio.ensure_future(self.runAsync(rfa.readFile, path))
+            future.add_done_callback(lambda future: self.asyncPending.pop(key, None))
+        data = await asyncio.shield(future) # a cancelled request does not cancel the extraction for the others
+        return(str(data, "utf-8", errors="ignore") if asString else data)
+    
+    async def aiterFile(self, path): # iterFile for asyncio, every segment is read and decompressed in the executor
+        segments = self.iterFile(path)
+        try:
+            while True:
+                data = await self.runAsync(next, segments, None)
+                if data is None:
+                    return
+                yield(data)
+        finally: # a consumer that stops early would otherwise leave the archive open until the generator is collected
+            try: await self.runAsync(segments.close)
+            except ValueError: pass # a cancelled next is still running in the executor, the generator is closed once it is collected
+    
+    def extractAll(self, destinationDir = None, workers = 1, processes = False, sync = False, deleteStale = False): # only the files with the highest priority are extracted
+        entries = []
+        for key, rfa in self.fileIndex.items():
+            fileInfo = rfa.fileList.entry(rfa.findRow(key))
+            entries.append((rfa, fileInfo, fileInfo[0] if destinationDir == None else os.path.join(destinationDir, fileInfo[0])))
+        if sync:
+            return(syncEntries(entries, destinationDir, workers, processes, deleteStale, [rfa.path for rfa in self.rfas]))
+        return(extractEntries(entries, workers, processes))
         
     def fileExists(self, path):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None: return(True)
-        return(False)
+        return(self.getArchive(path) != None)
     
     def getCorrectFilePath(self, path):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None: return(filePathInRFA)
-        return(None)
\ No newline at end of file
+        rfa = self.getArchive(path)
+        return(None if rfa == None else rfa.getCorrectFilePath(path))
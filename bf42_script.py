@@ -1,9 +1,16 @@
 import os
 import re
+import gc
+import io
 import math
 import pickle
 import json
+import hashlib
 import sys
+import mmap
+import struct
+import itertools
+from array import array
 from pathlib import PurePosixPath as BFPath
 
 # method to store objects as strings:
@@ -95,23 +102,55 @@ def bf42_vec3_Add(v1,v2):
     v = BF42_vec3((v1.x,v1.y,v1.z))
     return(v.add(v2))
 
+def bf42_vec3_iter(values): # vectors of a flat x/y/z sequence
+    new = BF42_vec3.__new__
+    for x, y, z in zip(*[iter(values)]*3):
+        v = new(BF42_vec3)
+        v.x = x; v.y = y; v.z = z
+        yield(v)
+
+def bf42_vec3_fromValues(values, i): # vector i of a flat x/y/z sequence, without going through the parsing in BF42_vec3.__init__
+    v = BF42_vec3.__new__(BF42_vec3)
+    v.x, v.y, v.z = values[3*i], values[3*i+1], values[3*i+2]
+    return(v)
+
+bf42_regexLine = re.compile(r"^[\t\f ]*([^\t^\f^ ^\.]*)(?:\.([^\t^\f^ ^\n]*)){0,1}[\t\f ]*(.*)", flags = re.ASCII|re.IGNORECASE)
+bf42_regexArgument = re.compile(r'(?:"(?:(?:.*?")|(?:.*)))|(?:[^\t^\f^ ]+)', flags = re.ASCII)
+
+def bf42_parseLine(line): # returns (className, method, arguments, targetVariable), missing parts are None
+    className, method, arguments_str = bf42_regexLine.match(line).groups()
+    arguments = [argument.replace('"', '') for argument in bf42_regexArgument.findall(arguments_str)] if arguments_str != "" else []
+    targetVariable = None
+    if len(arguments) > 1 and arguments[-2] == "->" and arguments[-1].lower().startswith("v_"):
+        targetVariable = arguments[-1]
+        arguments = arguments[:-2]
+    return((className or None, method or None, arguments, targetVariable))
+
+def bf42_lexScript(text): # tokenizes a whole script in one pass, returns a list of commands for BF42_script.execute
+    # command: (lineNumber, className.lower(), method.lower() or None, className, arguments, targetVariable, has v_/c_ arguments)
+    commands = []
+    intern = sys.intern
+    for lineNumber, line in enumerate(text.splitlines()):
+        className, method, arguments, targetVariable = bf42_parseLine(line.strip())
+        if className == None:
+            continue
+        substitute = any(argument[:2].lower() in ("v_", "c_") for argument in arguments)
+        commands.append((lineNumber, intern(className.lower()), None if method == None else intern(method.lower()), className, tuple(arguments), targetVariable, substitute))
+    return(commands)
+
+def bf42_methodKeys(name): # the method names isMethod accepts for name
+    return(frozenset([name.lower(), "set"+name.lower()]))
+
+bf42_methods_create = bf42_methodKeys("create")
+bf42_methods_active = bf42_methodKeys("active")
+bf42_methods_createNewInfo = bf42_methodKeys("createNewInfo")
+bf42_methods_alternativePath = bf42_methodKeys("alternativePath")
+bf42_methods_worldSize = bf42_methodKeys("worldSize")
+bf42_methods_name = bf42_methodKeys("name")
+
 class BF42_command:
     def __init__(self, cmd_str):
-        self.className = None; self.method = None; self.arguments = []; self.targetVariable = None
-        # regex = "^([\t\f ]*)([^\t^\f^ ^\.^\n]*)(?:(\.)([^\t^\f^ ^\n]*)){0,1}([\t\f ]*)([^\n]*)" # this is the regex to parse a whole file
-        regex = "^[\t\f ]*([^\t^\f^ ^\.]*)(?:\.([^\t^\f^ ^\n]*)){0,1}[\t\f ]*(.*)"
-        regexResult = re.findall(regex, cmd_str, flags = re.ASCII|re.IGNORECASE|re.MULTILINE)
-        if len(regexResult) == 1:
-            splitted = regexResult[0]
-            if splitted[0] != "": self.className = splitted[0]
-            if splitted[1] != "": self.method = splitted[1]
-            if splitted[2] != "": 
-                arguments_str = splitted[2]
-                regex = r'(?:"(?:(?:.*?")|(?:.*)))|(?:[^\t^\f^ ]+)'
-                self.arguments = [argument.replace('"', '') for argument in re.findall(regex, arguments_str, flags = re.ASCII)]
-                if len(self.arguments) > 1 and self.arguments[-2] == "->" and self.arguments[-1].lower().startswith("v_"):
-                    self.targetVariable = self.arguments[-1]
-                    self.arguments = self.arguments[:-2]
+        self.className, self.method, self.arguments, self.targetVariable = bf42_parseLine(cmd_str)
     
     def __eq__(self, commandString): #commandString has className.method as format where either part can be empty
         parts = commandString.split('.', 1)
@@ -126,9 +165,42 @@ class BF42_command:
 def isMethod(method, methodReference):
     return(method.lower() == methodReference.lower() or method.lower() == "set"+methodReference.lower())
 
+def bf42_methodTable(methods): # execMethod dispatch table, name.lower() and "set"+name.lower() -> function, the first definition wins like it did with isMethod
+    table = {}
+    for name, method in methods.items():
+        table.setdefault(name.lower(), method)
+        table.setdefault("set"+name.lower(), method)
+    return(table)
+
 def bf42_is_linked(template):
     return(type(template) != str or type(template) == int)
 
+class BF42_nameIndex: # case insensitive name -> first item of a list with that name, items appended to the list are indexed on the next lookup
+    def __init__(self):
+        self.items = None
+        self.names = {}
+        self.count = 0
+    
+    def invalidate(self): # call after renaming an item
+        self.items = None
+    
+    def get(self, items, name):
+        if items is not self.items or len(items) < self.count: # the list was replaced or shortened
+            self.items = items
+            self.names = {}
+            self.count = 0
+        if self.count < len(items):
+            setdefault = self.names.setdefault
+            for item in itertools.islice(items, self.count, None):
+                setdefault(item.name.lower(), item)
+            self.count = len(items)
+        key = name.lower()
+        item = self.names.get(key)
+        if item != None and item.name.lower() != key: # renamed without invalidate
+            self.invalidate()
+            return(self.get(items, name))
+        return(item)
+
 class BF42_data:
     def __init__(self):
         self.objectTemplates = []
@@ -147,6 +219,10 @@ class BF42_data:
         self.constants = {}
         self.lastObjectTemplateID = -1
         self.lastObjectID = -1
+        self.objectTemplateIndex = BF42_nameIndex()
+        self.networkableInfoIndex = BF42_nameIndex()
+        self.geometryTemplateIndex = BF42_nameIndex()
+        self.objectIndex = BF42_nameIndex()
         
         with open('constants.txt') as file:
             for line in file:
@@ -162,29 +238,16 @@ class BF42_data:
         return(self.lastObjectID)
     
     def getObject(self, name):
-        for object in self.objects:
-            if object.name.lower() == name.lower():
-                return(objectTemplate)
-        return(None)
+        return(self.objectIndex.get(self.objects, name))
     
     def getObjectTemplate(self, name):
-        for objectTemplate in self.objectTemplates:
-            if objectTemplate.name.lower() == name.lower():
-                return(objectTemplate)
-        # print("could not find objectTemplate: "+name)
-        return(None)
+        return(self.objectTemplateIndex.get(self.objectTemplates, name))
     
     def getNetworkableInfo(self, name):
-        for networkableInfo in self.networkableInfos:
-            if networkableInfo.name.lower() == name.lower():
-                return(networkableInfo)
-        return(None)
+        return(self.networkableInfoIndex.get(self.networkableInfos, name))
     
     def getGeometryTemplate(self, name):
-        for geometryTemplate in self.geometryTemplates:
-            if geometryTemplate.name.lower() == name.lower():
-                return(geometryTemplate)
-        return(None)
+        return(self.geometryTemplateIndex.get(self.geometryTemplates, name))
         
     def creatLinks(self):
         for object in self.objects:
@@ -202,34 +265,38 @@ class BF42_data:
             if objectTemplate.networkableInfo:
                 if not bf42_is_linked(objectTemplate.networkableInfo):
                     objectTemplate.networkableInfo = self.getNetworkableInfo(objectTemplate.networkableInfo)
-            geometry = self.getGeometryTemplate(objectTemplate.geometry)
-            if geometry != None:
-                objectTemplate.geometry = geometry
+            if not bf42_is_linked(objectTemplate.geometry):
+                geometry = self.getGeometryTemplate(objectTemplate.geometry)
+                if geometry != None:
+                    objectTemplate.geometry = geometry
         
     def dumps(self):
         list_dump = [[],[],[],[]]
+        objectTemplateIndex = {id(objectTemplate): i for i, objectTemplate in enumerate(self.objectTemplates)}
+        geometryTemplateIndex = {id(geometryTemplate): i for i, geometryTemplate in enumerate(self.geometryTemplates)}
+        objectIndex = {id(object): i for i, object in enumerate(self.objects)}
         for objectTemplate in self.objectTemplates:
-            geometry = self.geometryTemplates.index(objectTemplate.geometry) if bf42_is_linked(objectTemplate.geometry) else objectTemplate.geometry
+            geometry = geometryTemplateIndex[id(objectTemplate.geometry)] if bf42_is_linked(objectTemplate.geometry) else objectTemplate.geometry
             childeren = []
             for child in objectTemplate.childeren:
-                template = self.objectTemplates.index(child.template) if bf42_is_linked(child.template) else child.template
+                template = objectTemplateIndex[id(child.template)] if bf42_is_linked(child.template) else child.template
                 childeren.append([template, child.setPosition.lst(), child.setRotation.lst()])
             linePoints = [linePoint.lst() for linePoint in objectTemplate.linePoints]
             list_dump[0].append([objectTemplate.type, objectTemplate.name, geometry, objectTemplate.triggerRadius, linePoints, childeren])
         for geometryTemplate in self.geometryTemplates:
             list_dump[1].append([geometryTemplate.type, geometryTemplate.name, geometryTemplate.scale.lst(), geometryTemplate.file, geometryTemplate.materialSize, geometryTemplate.worldSize, geometryTemplate.yScale, geometryTemplate.waterLevel])
         for object in self.objects:
-            template = self.objectTemplates.index(object.template) if bf42_is_linked(object.template) else object.template
+            template = objectTemplateIndex[id(object.template)] if bf42_is_linked(object.template) else object.template
             list_dump[2].append([template, object.absolutePosition.lst(), object.rotation.lst(), object.geometry_scale.lst()])
         for staticObject in self.staticObjects:
-            list_dump[3].append(self.objects.index(staticObject))
+            list_dump[3].append(objectIndex[id(staticObject)])
         return(dumps(list_dump))
         
     def loads(self, dataDump):
         list_dump = loads(dataDump)
         # load objectTemplates
         for (type, name, geometry, triggerRadius, linePoints, childeren) in list_dump[0]:
-            objectTemplate = BF42_ObjectTemplate(type, name)
+            objectTemplate = BF42_ObjectTemplate(type, name, self.getNextObjectTemplateID())
             objectTemplate.geometry = geometry
             objectTemplate.triggerRadius = triggerRadius
             objectTemplate.linePoints = [BF42_vec3(linePoint) for linePoint in linePoints]
@@ -258,7 +325,7 @@ class BF42_data:
                 objectTemplate.geometry = self.geometryTemplates[objectTemplate.geometry]
         # load and link objects
         for (template, absolutePosition, rotation, geometry_scale) in list_dump[2]:
-            object = BF42_Object("")
+            object = BF42_Object("", self.getNextObjectID())
             object.template = self.objectTemplates[template] if bf42_is_linked(template) else template
             object.absolutePosition = BF42_vec3(absolutePosition)
             object.rotation = BF42_vec3(rotation)
@@ -268,6 +335,128 @@ class BF42_data:
         for i in list_dump[3]:
             self.staticObjects.append(self.objects[i])
         return(self)
+    
+    def dumpSnapshot(self): # binary snapshot, see BF42_snapshot. variables, constants and the active_ items of a running script are not stored
+        strings = {}
+        def string(value):
+            if value == None:
+                return(BF42_SNAPSHOT_NONE)
+            return(strings.setdefault(str(value), len(strings)))
+        def integer(value):
+            return(BF42_SNAPSHOT_NOINT if value == None else int(value))
+        def reference(value, index): # index of a linked item, or -1-(string index) for names that are not linked
+            if value != None and bf42_is_linked(value):
+                return(index[id(value)])
+            return(-1-string(value))
+        objectTemplateIndex = {id(objectTemplate): i for i, objectTemplate in enumerate(self.objectTemplates)}
+        geometryTemplateIndex = {id(geometryTemplate): i for i, geometryTemplate in enumerate(self.geometryTemplates)}
+        networkableInfoIndex = {id(networkableInfo): i for i, networkableInfo in enumerate(self.networkableInfos)}
+        objectIndex = {id(object): i for i, object in enumerate(self.objects)}
+        columns = {name: array(typecode) for name, typecode, table, width in BF42_SNAPSHOT_COLUMNS}
+        counts = dict.fromkeys(BF42_SNAPSHOT_TABLES, 0)
+        for networkableInfo in self.networkableInfos:
+            columns["networkableInfoName"].append(string(networkableInfo.name))
+            columns["networkableInfoIsUnique"].append(int(networkableInfo.isUnique))
+            columns["networkableInfoBasePriority"].append(float(networkableInfo.basePriority))
+            columns["networkableInfoPredictionMode"].append(int(networkableInfo.predictionMode))
+        for geometryTemplate in self.geometryTemplates:
+            columns["geometryType"].append(string(geometryTemplate.type))
+            columns["geometryName"].append(string(geometryTemplate.name))
+            columns["geometryFile"].append(string(geometryTemplate.file))
+            columns["geometryScale"].extend(geometryTemplate.scale.lst())
+            columns["geometryMaterialSize"].append(int(geometryTemplate.materialSize))
+            columns["geometryWorldSize"].append(int(geometryTemplate.worldSize))
+            columns["geometryYScale"].append(float(geometryTemplate.yScale))
+            columns["geometryWaterLevel"].append(float(geometryTemplate.waterLevel))
+        for objectTemplate in self.objectTemplates:
+            columns["templateType"].append(string(objectTemplate.type))
+            columns["templateName"].append(string(objectTemplate.name))
+            columns["templateID"].append(objectTemplate.ID)
+            columns["templateGeometry"].append(reference(objectTemplate.geometry, geometryTemplateIndex))
+            columns["templateNetworkableInfo"].append(reference(objectTemplate.networkableInfo, networkableInfoIndex))
+            columns["templateTriggerRadius"].append(int(objectTemplate.triggerRadius))
+            columns["templateChildStart"].append(counts["children"])
+            columns["templateChildCount"].append(len(objectTemplate.childeren))
+            columns["templateLinePointStart"].append(counts["linePoints"])
+            columns["templateLinePointCount"].append(len(objectTemplate.linePoints))
+            columns["templateMaxHitPoints"].append(float(objectTemplate.maxHitPoints))
+            columns["templateMinRotation"].extend(objectTemplate.minRotation.lst())
+            columns["templateMaxRotation"].extend(objectTemplate.maxRotation.lst())
+            columns["templateMaxSpeed"].extend(objectTemplate.maxSpeed.lst())
+            columns["templateAcceleration"].extend(objectTemplate.acceleration.lst())
+            columns["templateInputToYaw"].append(int(objectTemplate.inputToYaw))
+            columns["templateInputToPitch"].append(int(objectTemplate.inputToPitch))
+            columns["templateInputToRoll"].append(int(objectTemplate.inputToRoll))
+            columns["templateAutomaticReset"].append(int(objectTemplate.automaticReset))
+            columns["templateMagSize"].append(int(objectTemplate.magSize))
+            columns["templateNumOfMag"].append(int(objectTemplate.numOfMag))
+            columns["templateNumberOfGears"].append(integer(objectTemplate.numberOfGears))
+            columns["templateGearUp"].append(float(objectTemplate.gearUp))
+            columns["templateGearDown"].append(float(objectTemplate.gearDown))
+            columns["templateControlPointName"].append(string(objectTemplate.controlPointName))
+            columns["templateTeam"].append(string(objectTemplate.team))
+            columns["templateUnableToChangeTeam"].append(string(objectTemplate.unableToChangeTeam))
+            columns["templateMinSpawnDelay"].append(string(objectTemplate.MinSpawnDelay))
+            columns["templateMaxSpawnDelay"].append(string(objectTemplate.MaxSpawnDelay))
+            columns["templateSpawnDelayAtStart"].append(string(objectTemplate.SpawnDelayAtStart))
+            columns["templateTimeToLive"].append(string(objectTemplate.TimeToLive))
+            columns["templateDistance"].append(string(objectTemplate.Distance))
+            columns["templateDamageWhenLost"].append(string(objectTemplate.DamageWhenLost))
+            columns["templateMaxNrOfObjectSpawned"].append(string(objectTemplate.maxNrOfObjectSpawned))
+            columns["templateTeamOnVehicle"].append(string(objectTemplate.teamOnVehicle))
+            columns["templateSpawnerTemplateStart"].append(counts["spawnerTemplates"])
+            columns["templateSpawnerTemplateCount"].append(len(objectTemplate.objectTemplates))
+            for key, name in objectTemplate.objectTemplates.items():
+                columns["spawnerTemplateKey"].append(int(key))
+                columns["spawnerTemplateName"].append(string(name))
+            counts["spawnerTemplates"] += len(objectTemplate.objectTemplates)
+            for child in objectTemplate.childeren:
+                columns["childTemplate"].append(reference(child.template, objectTemplateIndex))
+                columns["childPosition"].extend(child.setPosition.lst())
+                columns["childRotation"].extend(child.setRotation.lst())
+            for linePoint in objectTemplate.linePoints:
+                columns["linePoints"].extend(linePoint.lst())
+            counts["children"] += len(objectTemplate.childeren)
+            counts["linePoints"] += len(objectTemplate.linePoints)
+        for object in self.objects:
+            columns["objectTemplate"].append(reference(object.template, objectTemplateIndex))
+            columns["objectID"].append(object.ID)
+            columns["objectName"].append(string(object.name))
+            columns["objectTeam"].append(string(object.team))
+            columns["objectOSId"].append(string(object.OSId))
+            columns["objectPosition"].extend(object.absolutePosition.lst())
+            columns["objectRotation"].extend(object.rotation.lst())
+            columns["objectGeometryScale"].extend(object.geometry_scale.lst())
+        for staticObject in self.staticObjects:
+            columns["staticObjects"].append(objectIndex[id(staticObject)])
+        game = self.game
+        columns["gameMapId"].append(string(game.mapId))
+        columns["gameActiveCombatArea"].extend([BF42_SNAPSHOT_NOINT]*4 if game.activeCombatArea == None else game.activeCombatArea)
+        columns["gameCustomGameName"].append(string(game.customGameName))
+        columns["gameCustomGameVersion"].append(string(game.customGameVersion))
+        columns["gameMultiplayerBriefingObjectives"].append(string(game.multiplayerBriefingObjectives))
+        columns["gameObjectiveBriefing"].append(string(game.objectiveBriefing))
+        columns["consoleWorldSize"].append(integer(self.console_worldSize))
+        columns["modPaths"].extend([string(modPath) for modPath in game.modPaths])
+        columns["alternativePaths"].extend([string(alternativePath) for alternativePath in self.textureManager_alternativePaths])
+        blob = bytearray()
+        for value in strings: # dicts keep the insertion order, which is the string index
+            blob += value.encode("utf-8")
+            columns["stringEnds"].append(len(blob))
+        counts.update(strings = len(strings), networkableInfos = len(self.networkableInfos), geometries = len(self.geometryTemplates), templates = len(self.objectTemplates), objects = len(self.objects), staticObjects = len(self.staticObjects), globals = 1, modPaths = len(game.modPaths), alternativePaths = len(self.textureManager_alternativePaths))
+        dump = bytearray(BF42_SNAPSHOT_HEADER.pack(BF42_SNAPSHOT_MAGIC, BF42_SNAPSHOT_VERSION, *[counts[table] for table in BF42_SNAPSHOT_TABLES], len(blob)))
+        for name, typecode, table, width in BF42_SNAPSHOT_COLUMNS:
+            dump += bytes(-len(dump) % 8) # every column starts 8 byte aligned
+            dump += columns[name].tobytes()
+        dump += blob
+        return(bytes(dump))
+    
+    def saveSnapshot(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.dumpSnapshot())
+    
+    def loadSnapshot(self, path): # eager load of a snapshot, use BF42_snapshot directly to only build what is needed
+        return(BF42_snapshot(path, lazy = False).load(self))
 
 predictionModeEnum = ['PMNone', 'PMLinear', 'PMCubic', 'PMUsePhysics']
 
@@ -282,26 +471,26 @@ class BF42_Game:
         self.modPaths = []
     
     def execMethod(self, methodName, arguments):
-        def setMapId(value): self.mapId = value
-        def setActiveCombatArea(a,b,c,d): self.activeCombatArea = (int(a), int(b), int(c), int(d))
-        def customGameName(value = None):
+        method = self.methods.get(methodName.lower())
+        if method != None:
+            try: return(method(self, *arguments))
+            except: pass
+        return(False)
+    
+    def methods(): # execMethod dispatch table, built once per class
+        def setMapId(self, value): self.mapId = value
+        def setActiveCombatArea(self, a,b,c,d): self.activeCombatArea = (int(a), int(b), int(c), int(d))
+        def customGameName(self, value = None):
             if value != None: self.customGameName = value
             return(self.customGameName)
-        def customGameVersion(value = None):
+        def customGameVersion(self, value = None):
             if value != None: self.customGameVersion = value
             return(self.customGameVersion)
-        def addModPath(value): self.modPaths.append(value)
-        def setMultiplayerBriefingObjectives(value): self.multiplayerBriefingObjectives = value
-        def setObjectiveBriefing(value): self.objectiveBriefing = value
-        
-        methods = locals()
-        methods = {name: methods[name] for name in methods if not name in ['methodName', 'arguments']}
-        for method in methods:
-            if isMethod(methodName, method):
-                try: return(methods[method](*arguments))
-                except: pass
-                break
-        return(False)
+        def addModPath(self, value): self.modPaths.append(value)
+        def setMultiplayerBriefingObjectives(self, value): self.multiplayerBriefingObjectives = value
+        def setObjectiveBriefing(self, value): self.objectiveBriefing = value
+        return(bf42_methodTable(locals()))
+    methods = methods()
 
 class BF42_ObjectTemplate:
     def __init__(self, type, name, ID):
@@ -345,94 +534,94 @@ class BF42_ObjectTemplate:
         self.parents = [] # not used inside module
     
     def execMethod(self, methodName, arguments):
-        def networkableInfo(value):
+        method = self.methods.get(methodName.lower())
+        if method != None:
+            try: return(method(self, *arguments))
+            except: pass
+        return(False)
+    
+    def methods(): # execMethod dispatch table, built once per class
+        def networkableInfo(self, value):
             if value != None: self.networkableInfo = value
             return(self.networkableInfo)
-        def geometry(value):
+        def geometry(self, value):
             if value != None: self.geometry = value
             return(self.geometry)
-        def maxHitPoints(value = None):
+        def maxHitPoints(self, value = None):
             if value != None: self.maxHitPoints = float(value)
             return(self.maxHitPoints)
-        def minRotation(value = None):
+        def minRotation(self, value = None):
             if value != None: self.minRotation = BF42_vec3(value)
             return(self.minRotation)
-        def maxRotation(value = None):
+        def maxRotation(self, value = None):
             if value != None: self.maxRotation = BF42_vec3(value)
             return(self.maxRotation)
-        def maxSpeed(value = None):
+        def maxSpeed(self, value = None):
             if value != None: self.maxSpeed = BF42_vec3(value)
             return(self.maxSpeed)
-        def acceleration(value = None):
+        def acceleration(self, value = None):
             if value != None: self.acceleration = BF42_vec3(value)
             return(self.acceleration)
-        def inputToPitch(value = None):
+        def inputToPitch(self, value = None):
             if value != None: self.inputToPitch = int(value)
             return(self.inputToPitch)
-        def inputToYaw(value = None):
+        def inputToYaw(self, value = None):
             if value != None: self.inputToYaw = int(value)
             return(self.inputToYaw)
-        def inputToRoll(value = None):
+        def inputToRoll(self, value = None):
             if value != None: self.inputToRoll = int(value)
             return(self.inputToRoll)
-        def automaticReset(value = None):
+        def automaticReset(self, value = None):
             if value != None: self.automaticReset = bool(int(value))
             return(self.automaticReset)
-        def magSize(value = None):
+        def magSize(self, value = None):
             if value != None: self.magSize = int(value)
             return(self.magSize)
-        def numOfMag(value = None):
+        def numOfMag(self, value = None):
             if value != None: self.numOfMag = int(value)
             return(self.numOfMag)
-        def numberOfGears(value = None):
+        def numberOfGears(self, value = None):
             if value != None: self.numberOfGears  = int(value)
             return(self.numberOfGears)
-        def gearUp(value = None):
+        def gearUp(self, value = None):
             if value != None: self.gearUp  = float(value)
             return(self.gearUp )
-        def gearDown(value = None):
+        def gearDown(self, value = None):
             if value != None: self.gearDown  = float(value)
             return(self.gearDown)
-        def triggerRadius(value): self.triggerRadius = int(value)
-        def addLinePoint(value): self.linePoints.append(BF42_vec3(value))
-        def controlPointName(value): self.controlPointName = value
-        def team(value): self.team = value
-        def unableToChangeTeam(value): self.unableToChangeTeam = value
+        def triggerRadius(self, value): self.triggerRadius = int(value)
+        def addLinePoint(self, value): self.linePoints.append(BF42_vec3(value))
+        def controlPointName(self, value): self.controlPointName = value
+        def team(self, value): self.team = value
+        def unableToChangeTeam(self, value): self.unableToChangeTeam = value
         
-        def MinSpawnDelay(value): self.MinSpawnDelay = value
-        def MaxSpawnDelay(value): self.MaxSpawnDelay = value
-        def SpawnDelayAtStart(value): self.SpawnDelayAtStart = value
-        def TimeToLive(value): self.TimeToLive = value
-        def Distance(value): self.Distance = value
-        def DamageWhenLost(value): self.DamageWhenLost = value
-        def maxNrOfObjectSpawned(value): self.maxNrOfObjectSpawned = value
-        def teamOnVehicle(value): self.teamOnVehicle = value
-        def setObjectTemplate(key, value): self.objectTemplates[int(key)] = value
+        def MinSpawnDelay(self, value): self.MinSpawnDelay = value
+        def MaxSpawnDelay(self, value): self.MaxSpawnDelay = value
+        def SpawnDelayAtStart(self, value): self.SpawnDelayAtStart = value
+        def TimeToLive(self, value): self.TimeToLive = value
+        def Distance(self, value): self.Distance = value
+        def DamageWhenLost(self, value): self.DamageWhenLost = value
+        def maxNrOfObjectSpawned(self, value): self.maxNrOfObjectSpawned = value
+        def teamOnVehicle(self, value): self.teamOnVehicle = value
+        def setObjectTemplate(self, key, value): self.objectTemplates[int(key)] = value
         
-        def addTemplate(value):
+        def addTemplate(self, value):
             self.active_child = BF42_ObjectTemplateChild(value)
             self.childeren.append(self.active_child)
-        def setActiveTemplate(value):
+        def setActiveTemplate(self, value):
             if len(self.childeren) > int(value):
                 self.active_child = self.childeren[int(value)]
-        def removeTemplate(value):
+        def removeTemplate(self, value):
             if len(self.childeren) > int(value):
                 self.childeren.pop(int(value))
-        def setPosition(value):
+        def setPosition(self, value):
             if self.active_child != None:
                 self.active_child.setPosition = BF42_vec3(value)
-        def setRotation(value):
+        def setRotation(self, value):
             if self.active_child != None:
                 self.active_child.setRotation = BF42_vec3(value)
-        
-        methods = locals()
-        methods = {name: methods[name] for name in methods if not name in ['methodName', 'arguments']}
-        for method in methods:
-            if isMethod(methodName, method):
-                try: return(methods[method](*arguments))
-                except: pass
-                break
-        return(False)
+        return(bf42_methodTable(locals()))
+    methods = methods()
 
 class BF42_ObjectTemplateChild:
     def __init__(self, template):
@@ -450,18 +639,18 @@ class BF42_NetworkableInfo:
         self.forceNetworkableId = False
     
     def execMethod(self, methodName, arguments):
-        def setBasePriority(value): self.basePriority = float(value)
-        def setIsUnique(value): self.isUnique = bool(int(value))
-        def setPredictionMode(value): self.predictionMode = predictionModeEnum.index(value)
-        
-        methods = locals()
-        methods = {name: methods[name] for name in methods if not name in ['methodName', 'arguments']}
-        for method in methods:
-            if isMethod(methodName, method):
-                try: return(methods[method](*arguments))
-                except: pass
-                break
+        method = self.methods.get(methodName.lower())
+        if method != None:
+            try: return(method(self, *arguments))
+            except: pass
         return(False)
+    
+    def methods(): # execMethod dispatch table, built once per class
+        def setBasePriority(self, value): self.basePriority = float(value)
+        def setIsUnique(self, value): self.isUnique = bool(int(value))
+        def setPredictionMode(self, value): self.predictionMode = predictionModeEnum.index(value)
+        return(bf42_methodTable(locals()))
+    methods = methods()
 
 class BF42_GeometryTemplate:
     def __init__(self, type, name):
@@ -475,19 +664,20 @@ class BF42_GeometryTemplate:
         self.waterLevel = 0
     
     def execMethod(self, methodName, arguments):
-        def scale(value): self.scale = BF42_vec3(value)
-        def file(value): self.file = value.replace("\\","/")
-        def materialsize(value): self.materialsize = int(value)
-        def worldsize(value): self.worldsize = int(value)
-        def yscale(value): self.yscale = float(value)
-        def waterlevel(value): self.waterlevel = float(value)
-        methods = locals()
-        methods = {name: methods[name] for name in methods if not name in ['methodName', 'arguments']}
-        for method in methods:
-            if isMethod(methodName, method):
-                try: methods[method](*arguments)
-                except: pass
-                break
+        method = self.methods.get(methodName.lower())
+        if method != None:
+            try: method(self, *arguments)
+            except: pass
+    
+    def methods(): # execMethod dispatch table, built once per class
+        def scale(self, value): self.scale = BF42_vec3(value)
+        def file(self, value): self.file = value.replace("\\","/")
+        def materialsize(self, value): self.materialsize = int(value)
+        def worldsize(self, value): self.worldsize = int(value)
+        def yscale(self, value): self.yscale = float(value)
+        def waterlevel(self, value): self.waterlevel = float(value)
+        return(bf42_methodTable(locals()))
+    methods = methods()
         
 class BF42_Object:
     def __init__(self, template, ID):
@@ -510,198 +700,532 @@ class BF42_Object:
             elif isMethod(name, "team"): self.team = value
             elif isMethod(name, "name"): self.name = value
 
+BF42_SNAPSHOT_MAGIC = b"BF42SNAP"
+BF42_SNAPSHOT_VERSION = 2
+BF42_SNAPSHOT_NONE = 0xFFFFFFFF # string index of None
+BF42_SNAPSHOT_NOINT = -2**63 # integer column value of None
+BF42_SNAPSHOT_TABLES = ["strings", "networkableInfos", "geometries", "templates", "children", "linePoints", "objects", "staticObjects", "spawnerTemplates", "globals", "modPaths", "alternativePaths"]
+BF42_SNAPSHOT_HEADER = struct.Struct('=8sI'+'I'*len(BF42_SNAPSHOT_TABLES)+'I') # magic, version, rows of every table, size of the string data
+BF42_SNAPSHOT_COLUMNS = [ # (name, array typecode, table, values per row), strings are indexes into the string table, references are an index into the table or -1-(string index) for unlinked names
+    ("stringEnds", "I", "strings", 1),
+    ("networkableInfoName", "I", "networkableInfos", 1),
+    ("networkableInfoIsUnique", "q", "networkableInfos", 1),
+    ("networkableInfoBasePriority", "d", "networkableInfos", 1),
+    ("networkableInfoPredictionMode", "q", "networkableInfos", 1),
+    ("geometryType", "I", "geometries", 1),
+    ("geometryName", "I", "geometries", 1),
+    ("geometryFile", "I", "geometries", 1),
+    ("geometryScale", "d", "geometries", 3),
+    ("geometryMaterialSize", "q", "geometries", 1),
+    ("geometryWorldSize", "q", "geometries", 1),
+    ("geometryYScale", "d", "geometries", 1),
+    ("geometryWaterLevel", "d", "geometries", 1),
+    ("templateType", "I", "templates", 1),
+    ("templateName", "I", "templates", 1),
+    ("templateID", "q", "templates", 1),
+    ("templateGeometry", "q", "templates", 1),
+    ("templateNetworkableInfo", "q", "templates", 1),
+    ("templateTriggerRadius", "q", "templates", 1),
+    ("templateChildStart", "I", "templates", 1),
+    ("templateChildCount", "I", "templates", 1),
+    ("templateLinePointStart", "I", "templates", 1),
+    ("templateLinePointCount", "I", "templates", 1),
+    ("templateMaxHitPoints", "d", "templates", 1),
+    ("templateMinRotation", "d", "templates", 3),
+    ("templateMaxRotation", "d", "templates", 3),
+    ("templateMaxSpeed", "d", "templates", 3),
+    ("templateAcceleration", "d", "templates", 3),
+    ("templateInputToYaw", "q", "templates", 1),
+    ("templateInputToPitch", "q", "templates", 1),
+    ("templateInputToRoll", "q", "templates", 1),
+    ("templateAutomaticReset", "q", "templates", 1),
+    ("templateMagSize", "q", "templates", 1),
+    ("templateNumOfMag", "q", "templates", 1),
+    ("templateNumberOfGears", "q", "templates", 1),
+    ("templateGearUp", "d", "templates", 1),
+    ("templateGearDown", "d", "templates", 1),
+    ("templateControlPointName", "I", "templates", 1),
+    ("templateTeam", "I", "templates", 1),
+    ("templateUnableToChangeTeam", "I", "templates", 1),
+    ("templateMinSpawnDelay", "I", "templates", 1),
+    ("templateMaxSpawnDelay", "I", "templates", 1),
+    ("templateSpawnDelayAtStart", "I", "templates", 1),
+    ("templateTimeToLive", "I", "templates", 1),
+    ("templateDistance", "I", "templates", 1),
+    ("templateDamageWhenLost", "I", "templates", 1),
+    ("templateMaxNrOfObjectSpawned", "I", "templates", 1),
+    ("templateTeamOnVehicle", "I", "templates", 1),
+    ("templateSpawnerTemplateStart", "I", "templates", 1),
+    ("templateSpawnerTemplateCount", "I", "templates", 1),
+    ("spawnerTemplateKey", "q", "spawnerTemplates", 1),
+    ("spawnerTemplateName", "I", "spawnerTemplates", 1),
+    ("childTemplate", "q", "children", 1),
+    ("childPosition", "d", "children", 3),
+    ("childRotation", "d", "children", 3),
+    ("linePoints", "d", "linePoints", 3),
+    ("objectTemplate", "q", "objects", 1),
+    ("objectID", "q", "objects", 1),
+    ("objectName", "I", "objects", 1),
+    ("objectTeam", "I", "objects", 1),
+    ("objectOSId", "I", "objects", 1),
+    ("objectPosition", "d", "objects", 3),
+    ("objectRotation", "d", "objects", 3),
+    ("objectGeometryScale", "d", "objects", 3),
+    ("staticObjects", "I", "staticObjects", 1),
+    ("gameMapId", "I", "globals", 1),
+    ("gameActiveCombatArea", "q", "globals", 4),
+    ("gameCustomGameName", "I", "globals", 1),
+    ("gameCustomGameVersion", "I", "globals", 1),
+    ("gameMultiplayerBriefingObjectives", "I", "globals", 1),
+    ("gameObjectiveBriefing", "I", "globals", 1),
+    ("consoleWorldSize", "q", "globals", 1),
+    ("modPaths", "I", "modPaths", 1),
+    ("alternativePaths", "I", "alternativePaths", 1),
+]
+
+class BF42_snapshot: # reads a file of BF42_data.saveSnapshot, lazy maps the file and only builds the items that are accessed
+    def __init__(self, path, lazy = True):
+        self.mmap = None
+        self.columns = {}
+        with open(path, 'rb') as f:
+            if lazy:
+                self.mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+                self.view = memoryview(self.mmap)
+            else:
+                self.view = memoryview(f.read())
+        try:
+            header = BF42_SNAPSHOT_HEADER.unpack_from(self.view)
+        except struct.error:
+            self.close()
+            raise ValueError("not a BF42 snapshot: "+str(path))
+        magic, version, blobSize = header[0], header[1], header[-1]
+        if magic != BF42_SNAPSHOT_MAGIC or version != BF42_SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError("not a BF42 snapshot of version %d: %s" % (BF42_SNAPSHOT_VERSION, path))
+        self.counts = dict(zip(BF42_SNAPSHOT_TABLES, header[2:-1]))
+        position = BF42_SNAPSHOT_HEADER.size
+        for name, typecode, table, width in BF42_SNAPSHOT_COLUMNS:
+            position += -position % 8
+            size = self.counts[table]*width*array(typecode).itemsize
+            if position+size > len(self.view):
+                self.close()
+                raise ValueError("snapshot is truncated: "+str(path))
+            column = self.view[position:position+size].cast(typecode)
+            self.columns[name] = column if lazy else column.tolist() # lists are faster to index when everything is built
+            position += size
+        self.blob = self.view[position:position+blobSize]
+        self.strings = {}
+        self.networkableInfos = {}
+        self.geometryTemplates = {}
+        self.objectTemplates = {}
+        self.objects = {}
+        self.game = None
+    
+    def __enter__(self):
+        return(self)
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        if self.mmap != None:
+            for column in self.columns.values():
+                column.release()
+            self.columns = {}
+            if hasattr(self, "blob"): self.blob.release()
+            self.view.release()
+            self.mmap.close()
+            self.mmap = None
+    
+    def getString(self, i):
+        if i == BF42_SNAPSHOT_NONE:
+            return(None)
+        string = self.strings.get(i)
+        if string == None:
+            ends = self.columns["stringEnds"]
+            string = self.strings[i] = str(self.blob[ends[i-1] if i > 0 else 0:ends[i]], "utf-8")
+        return(string)
+    
+    def getReference(self, value, getItem):
+        return(getItem(value) if value >= 0 else self.getString(-1-value))
+    
+    def getInteger(self, value):
+        return(None if value == BF42_SNAPSHOT_NOINT else value)
+    
+    def getGame(self):
+        if self.game == None:
+            columns = self.columns
+            game = self.game = BF42_Game()
+            game.mapId = self.getString(columns["gameMapId"][0])
+            activeCombatArea = tuple(columns["gameActiveCombatArea"][0:4])
+            game.activeCombatArea = None if activeCombatArea[0] == BF42_SNAPSHOT_NOINT else activeCombatArea
+            game.customGameName = self.getString(columns["gameCustomGameName"][0])
+            game.customGameVersion = self.getString(columns["gameCustomGameVersion"][0])
+            game.multiplayerBriefingObjectives = self.getString(columns["gameMultiplayerBriefingObjectives"][0])
+            game.objectiveBriefing = self.getString(columns["gameObjectiveBriefing"][0])
+            game.modPaths = [self.getString(i) for i in columns["modPaths"]]
+        return(self.game)
+    
+    def getConsoleWorldSize(self):
+        return(self.getInteger(self.columns["consoleWorldSize"][0]))
+    
+    def getAlternativePaths(self):
+        return([self.getString(i) for i in self.columns["alternativePaths"]])
+    
+    def getNetworkableInfo(self, i):
+        networkableInfo = self.networkableInfos.get(i)
+        if networkableInfo == None:
+            columns = self.columns
+            networkableInfo = self.networkableInfos[i] = BF42_NetworkableInfo(self.getString(columns["networkableInfoName"][i]))
+            networkableInfo.isUnique = bool(columns["networkableInfoIsUnique"][i])
+            networkableInfo.basePriority = columns["networkableInfoBasePriority"][i]
+            networkableInfo.predictionMode = columns["networkableInfoPredictionMode"][i]
+        return(networkableInfo)
+    
+    def getGeometryTemplate(self, i):
+        geometryTemplate = self.geometryTemplates.get(i)
+        if geometryTemplate == None:
+            columns = self.columns
+            geometryTemplate = self.geometryTemplates[i] = BF42_GeometryTemplate(self.getString(columns["geometryType"][i]), self.getString(columns["geometryName"][i]))
+            geometryTemplate.scale = bf42_vec3_fromValues(columns["geometryScale"], i)
+            geometryTemplate.file = self.getString(columns["geometryFile"][i])
+            geometryTemplate.materialSize = columns["geometryMaterialSize"][i]
+            geometryTemplate.worldSize = columns["geometryWorldSize"][i]
+            geometryTemplate.yScale = columns["geometryYScale"][i]
+            geometryTemplate.waterLevel = columns["geometryWaterLevel"][i]
+        return(geometryTemplate)
+    
+    def getObjectTemplate(self, i):
+        objectTemplate = self.objectTemplates.get(i)
+        if objectTemplate is None:
+            columns = self.columns
+            objectTemplate = self.objectTemplates[i] = BF42_ObjectTemplate(self.getString(columns["templateType"][i]), self.getString(columns["templateName"][i]), columns["templateID"][i])
+            objectTemplate.geometry = self.getReference(columns["templateGeometry"][i], self.getGeometryTemplate)
+            objectTemplate.networkableInfo = self.getReference(columns["templateNetworkableInfo"][i], self.getNetworkableInfo)
+            objectTemplate.triggerRadius = columns["templateTriggerRadius"][i]
+            objectTemplate.maxHitPoints = columns["templateMaxHitPoints"][i]
+            objectTemplate.minRotation = bf42_vec3_fromValues(columns["templateMinRotation"], i)
+            objectTemplate.maxRotation = bf42_vec3_fromValues(columns["templateMaxRotation"], i)
+            objectTemplate.maxSpeed = bf42_vec3_fromValues(columns["templateMaxSpeed"], i)
+            objectTemplate.acceleration = bf42_vec3_fromValues(columns["templateAcceleration"], i)
+            objectTemplate.inputToYaw = columns["templateInputToYaw"][i]
+            objectTemplate.inputToPitch = columns["templateInputToPitch"][i]
+            objectTemplate.inputToRoll = columns["templateInputToRoll"][i]
+            objectTemplate.automaticReset = bool(columns["templateAutomaticReset"][i])
+            objectTemplate.magSize = columns["templateMagSize"][i]
+            objectTemplate.numOfMag = columns["templateNumOfMag"][i]
+            objectTemplate.numberOfGears = self.getInteger(columns["templateNumberOfGears"][i])
+            objectTemplate.gearUp = columns["templateGearUp"][i]
+            objectTemplate.gearDown = columns["templateGearDown"][i]
+            objectTemplate.controlPointName = self.getString(columns["templateControlPointName"][i])
+            objectTemplate.team = self.getString(columns["templateTeam"][i])
+            objectTemplate.unableToChangeTeam = self.getString(columns["templateUnableToChangeTeam"][i])
+            objectTemplate.MinSpawnDelay = self.getString(columns["templateMinSpawnDelay"][i])
+            objectTemplate.MaxSpawnDelay = self.getString(columns["templateMaxSpawnDelay"][i])
+            objectTemplate.SpawnDelayAtStart = self.getString(columns["templateSpawnDelayAtStart"][i])
+            objectTemplate.TimeToLive = self.getString(columns["templateTimeToLive"][i])
+            objectTemplate.Distance = self.getString(columns["templateDistance"][i])
+            objectTemplate.DamageWhenLost = self.getString(columns["templateDamageWhenLost"][i])
+            objectTemplate.maxNrOfObjectSpawned = self.getString(columns["templateMaxNrOfObjectSpawned"][i])
+            objectTemplate.teamOnVehicle = self.getString(columns["templateTeamOnVehicle"][i])
+            start = columns["templateSpawnerTemplateStart"][i]
+            for j in range(start, start+columns["templateSpawnerTemplateCount"][i]):
+                objectTemplate.objectTemplates[columns["spawnerTemplateKey"][j]] = self.getString(columns["spawnerTemplateName"][j])
+            start = columns["templateLinePointStart"][i]
+            objectTemplate.linePoints = [bf42_vec3_fromValues(columns["linePoints"], j) for j in range(start, start+columns["templateLinePointCount"][i])]
+            start = columns["templateChildStart"][i]
+            for j in range(start, start+columns["templateChildCount"][i]): # the template is already cached, so children can refer back to it
+                child = BF42_ObjectTemplateChild(self.getReference(columns["childTemplate"][j], self.getObjectTemplate))
+                child.setPosition = bf42_vec3_fromValues(columns["childPosition"], j)
+                child.setRotation = bf42_vec3_fromValues(columns["childRotation"], j)
+                if bf42_is_linked(child.template):
+                    child.template.parents.append(objectTemplate)
+                objectTemplate.childeren.append(child)
+        return(objectTemplate)
+    
+    def getObject(self, i):
+        object = self.objects.get(i)
+        if object == None:
+            object = next(self.iterObjects(i, i+1))
+        return(object)
+    
+    def iterObjects(self, start = 0, end = None): # reads the columns sequentially, the object list is usually the biggest table
+        columns = self.columns
+        getString = self.getString
+        getObjectTemplate = self.getObjectTemplate
+        if end == None: end = self.counts["objects"]
+        rows = zip(*[columns[name][start:end] for name in ["objectTemplate", "objectID", "objectName", "objectTeam", "objectOSId"]])
+        vectors = [bf42_vec3_iter(columns[name][3*start:3*end]) for name in ["objectPosition", "objectRotation", "objectGeometryScale"]]
+        for i, (template, ID, name, team, OSId), absolutePosition, rotation, geometry_scale in zip(range(start, end), rows, *vectors):
+            object = self.objects.get(i)
+            if object == None:
+                object = self.objects[i] = BF42_Object.__new__(BF42_Object) # every attribute of BF42_Object.__init__ is set here, without building default vectors first
+                object.ID = ID
+                object.template = getObjectTemplate(template) if template >= 0 else getString(-1-template)
+                object.name = getString(name)
+                object.team = getString(team)
+                object.OSId = getString(OSId)
+                object.absolutePosition = absolutePosition
+                object.rotation = rotation
+                object.geometry_scale = geometry_scale
+            yield(object)
+    
+    def getStaticObjects(self):
+        return([self.getObject(i) for i in self.columns["staticObjects"]])
+    
+    def load(self, data): # builds everything and adds it to data (a BF42_data), returns data
+        gcEnabled = gc.isenabled()
+        gc.disable() # nothing built here is garbage, collections triggered by the many new objects would only slow the load down
+        try:
+            data.networkableInfos += [self.getNetworkableInfo(i) for i in range(self.counts["networkableInfos"])]
+            data.geometryTemplates += [self.getGeometryTemplate(i) for i in range(self.counts["geometries"])]
+            data.objectTemplates += [self.getObjectTemplate(i) for i in range(self.counts["templates"])]
+            data.objects += list(self.iterObjects())
+            data.staticObjects += self.getStaticObjects()
+            data.game = self.getGame()
+            data.console_worldSize = self.getConsoleWorldSize()
+            data.textureManager_alternativePaths += self.getAlternativePaths()
+        finally:
+            if gcEnabled: gc.enable()
+        data.lastObjectTemplateID = max([data.lastObjectTemplateID]+[objectTemplate.ID for objectTemplate in data.objectTemplates])
+        data.lastObjectID = max([data.lastObjectID]+[object.ID for object in data.objects])
+        return(data)
+
 def bf42_evaluate(value1, operator, value2):
     if operator == "==":
         return(value1.lower() == value2.lower())
     return(False)
 
+BF42_SCRIPT_CACHE_VERSION = 2 # part of every cache key, changing the command format only needs a new version
+
 class BF42_script:
-    def __init__(self, data = None, rfaGroup = None):
+    def __init__(self, data = None, rfaGroup = None, cacheDir = None): # cacheDir stores the lexed commands of every script for the next run
         if data == None: data = BF42_data()
         self.REM = False
         self.IFs = [] # 0 = False, 1 = True, 2 = has already been True
         self.rfaGroup = rfaGroup
         self.data = data
+        self.cacheDir = cacheDir
         
     def read(self, path, staticObjects = False, forceExternalPath = False, v_args = None):
         data = self.data
         if v_args != None:
             for i, v_arg in enumerate(v_args):
                 data.variables["v_arg"+str(i+1)] = v_arg
-        lines = []
+        commands = []
         try:
-            if self.rfaGroup == None or forceExternalPath:
-                fp = open(path, 'r', errors='replace')
-                lines = fp.readlines()
-            else:
-                fileString = self.rfaGroup.extractFile(str(path), asString = True)
-                if fileString == False:
-                    raise Exception(f"Can't find path in RFA: {path}")
-                lines = iter(fileString.splitlines())
+            commands = self.readCommands(path, forceExternalPath)
         except:
-            print("Could not find file: "+path, file = sys.stderr)
-        for lineNumber, line_raw in enumerate(lines):
+            print("Could not find file: "+str(path), file = sys.stderr)
+        return(self.execute(commands, path, staticObjects))
+    
+    def readCommands(self, path, forceExternalPath = False): # returns the lexed commands of a script, from the cache if the script did not change
+        external = self.rfaGroup == None or forceExternalPath
+        cachePath = None
+        if self.cacheDir != None:
+            if external: # loose files are recognized by their contents
+                with open(path, 'rb') as fp:
+                    fileBytes = fp.read()
+                cacheKey = ("file", hashlib.sha1(fileBytes).hexdigest())
+            else: # archive entries by the entry of the archive that wins in the override order of the group, a mod that shadows a file gets a new key
+                rfa = self.rfaGroup.getArchive(str(path))
+                fileInfo = None if rfa == None else rfa.getFileInfo(str(path))
+                if fileInfo == None:
+                    raise Exception(f"Can't find path in RFA: {path}")
+                stat = os.stat(rfa.path)
+                cacheKey = ("rfa", os.path.abspath(rfa.path), stat.st_mtime_ns, stat.st_size, fileInfo[0], fileInfo[1].doffset, fileInfo[1].csize, fileInfo[1].ucsize)
+            cachePath = os.path.join(self.cacheDir, hashlib.sha1(repr((BF42_SCRIPT_CACHE_VERSION,)+cacheKey).encode("utf-8")).hexdigest()+".bf42cmd")
+            try: # json instead of pickle, loading a cache file can not run code
+                with open(cachePath, 'r', encoding = "utf-8") as f:
+                    intern = sys.intern
+                    return([(lineNumber, intern(classKey), None if methodKey == None else intern(methodKey), className, tuple(arguments), targetVariable, substitute) for lineNumber, classKey, methodKey, className, arguments, targetVariable, substitute in json.load(f)])
+            except Exception: pass # not cached yet, or a damaged cache file that is replaced below
+        if external:
+            if cachePath != None:
+                fileString = io.TextIOWrapper(io.BytesIO(fileBytes), errors='replace').read() # decoded like open(path, 'r') does
+            else:
+                with open(path, 'r', errors='replace') as fp:
+                    fileString = fp.read()
+        else:
+            fileString = self.rfaGroup.extractFile(str(path), asString = True)
+            if fileString == False:
+                raise Exception(f"Can't find path in RFA: {path}")
+        commands = bf42_lexScript(fileString)
+        if cachePath != None:
+            try:
+                os.makedirs(self.cacheDir, exist_ok = True)
+                with open(cachePath+".%d.tmp" % os.getpid(), 'w', encoding = "utf-8") as f:
+                    json.dump(commands, f, separators = (",", ":"))
+                os.replace(cachePath+".%d.tmp" % os.getpid(), cachePath)
+            except OSError: pass # the cache is optional
+        return(commands)
+    
+    def execute(self, commands, path, staticObjects = False): # runs the commands of bf42_lexScript, path is used to resolve include and run
+        data = self.data
+        for lineNumber, classKey, methodKey, className, arguments, targetVariable, substitute in commands:
             try:
-                line = line_raw.strip()
-                command = BF42_command(line)
-                if command.className != None:
-                    numArgs = len(command.arguments)
-                    if command not in ["var", "const"]:
-                        for i in range(numArgs):
-                            if command.arguments[i].lower().startswith('v_'):
-                                command.arguments[i] = data.variables[command.arguments[i]] if command.arguments[i] in data.variables else command.arguments[i]
-                            elif command.arguments[i].lower().startswith('c_'):
-                                command.arguments[i] = data.constants[command.arguments[i]] if command.arguments[i] in data.constants else command.arguments[i]
-                    if command == "beginrem":
-                        self.REM = True
-                    elif command == "endrem":
-                        self.REM = False
-                    elif not command == "rem" and not self.REM:
-                        if command == "if" and numArgs == 3:
-                            if bf42_evaluate(*command.arguments):
-                                self.IFs.append(1)
-                            else:
-                                self.IFs.append(0)
-                        elif command == "elseif" and numArgs == 3:
-                            if len(self.IFs) > 0:
-                                if self.IFs[-1] == 0:
-                                    if bf42_evaluate(*command.arguments):
-                                        self.IFs[-1] = 1
-                                elif self.IFs[-1] == 1:
-                                    self.IFs[-1] = 2
-                            else:
-                                pass # elseif without if
-                        elif command == "else" and numArgs == 0:
-                            if len(self.IFs) > 0:
-                                if self.IFs[-1] == 0:
+                numArgs = len(arguments)
+                if substitute and classKey != "var" and classKey != "const":
+                    arguments = list(arguments) # commands can be executed again, substitute in a copy
+                    for i, argument in enumerate(arguments):
+                        prefix = argument[:2].lower()
+                        if prefix == "v_":
+                            arguments[i] = data.variables.get(argument, argument)
+                        elif prefix == "c_":
+                            arguments[i] = data.constants.get(argument, argument)
+                if classKey == "beginrem":
+                    self.REM = True
+                elif classKey == "endrem":
+                    self.REM = False
+                elif classKey != "rem" and not self.REM:
+                    if classKey == "if" and numArgs == 3:
+                        if bf42_evaluate(*arguments):
+                            self.IFs.append(1)
+                        else:
+                            self.IFs.append(0)
+                    elif classKey == "elseif" and numArgs == 3:
+                        if len(self.IFs) > 0:
+                            if self.IFs[-1] == 0:
+                                if bf42_evaluate(*arguments):
                                     self.IFs[-1] = 1
-                                elif self.IFs[-1] == 1:
-                                    self.IFs[-1] = 2
-                            else:
-                                pass # else without if
-                        elif command == "endif" and numArgs == 0:
-                            if len(self.IFs) > 0:
-                                self.IFs.pop()
-                            else:
-                                pass # endif without if
-                        elif not any(x in self.IFs for x in [0, 2]):
-                            if command.method != None:
-                                if command == "objectTemplate":
-                                    if command == ".create":
-                                        if numArgs == 2:
-                                            if data.getObjectTemplate(command.arguments[1]) == None:
-                                                data.active_ObjectTemplate = BF42_ObjectTemplate(command.arguments[0], command.arguments[1], data.getNextObjectTemplateID())
-                                                data.objectTemplates.append(data.active_ObjectTemplate)
-                                    elif command == ".active":
-                                        if numArgs == 1:
-                                            refered_ObjectTemplate = data.getObjectTemplate(command.arguments[0])
-                                            if refered_ObjectTemplate != None:
-                                                data.active_ObjectTemplate = refered_ObjectTemplate
-                                    else:
-                                        if data.active_ObjectTemplate != None:
-                                            data.active_ObjectTemplate.execMethod(command.method, command.arguments)
-                                if command == "networkableInfo":
-                                    if command == ".createNewInfo":
-                                        if numArgs == 1:
-                                            if data.getNetworkableInfo(command.arguments[0]) == None:
-                                                data.active_NetworkableInfo = BF42_NetworkableInfo(command.arguments[0])
-                                                data.networkableInfos.append(data.active_NetworkableInfo)
-                                    else:
-                                        if data.active_NetworkableInfo != None:
-                                            data.active_NetworkableInfo.execMethod(command.method, command.arguments)
-                                if command == "geometryTemplate":
-                                    if command == ".create":
-                                        if numArgs == 2:
-                                            if data.getGeometryTemplate(command.arguments[1]) == None:
-                                                data.active_GeometryTemplate = BF42_GeometryTemplate(command.arguments[0], command.arguments[1])
-                                                data.geometryTemplates.append(data.active_GeometryTemplate)
-                                    elif command == ".active":
-                                        if numArgs == 1:
-                                            refered_GeometryTemplate = data.getGeometryTemplate(command.arguments[0])
-                                            if refered_GeometryTemplate != None:
-                                                data.active_GeometryTemplate = refered_GeometryTemplate
-                                    else:
-                                        if data.active_GeometryTemplate != None:
-                                            data.active_GeometryTemplate.execMethod(command.method, command.arguments)
-                                
-                                elif command == "object":
-                                    if command == ".create":
-                                        if numArgs == 1:
-                                            data.active_Object = BF42_Object(command.arguments[0], data.getNextObjectID())
-                                            data.objects.append(data.active_Object)
-                                            if staticObjects:
-                                                data.staticObjects.append(data.active_Object)
-                                    elif command == ".active":
-                                        if numArgs == 1:
-                                            refered_Object = data.getObject(command.arguments[0])
-                                            if refered_Object != None:
-                                                data.active_Object = refered_Object
-                                    else:
-                                        if data.active_Object != None:
-                                            data.active_Object.setProperty(command.method, command.arguments)
-                                
-                                elif command == "texturemanager":
-                                    if command == ".alternativepath":
-                                        if numArgs == 1:
-                                            data.textureManager_alternativePaths.append(command.arguments[0])
-                                
-                                elif command == "game":
-                                    returnValue = data.game.execMethod(command.method, command.arguments)
-                                    if command.targetVariable != None and returnValue != False and command.targetVariable in data.variables:
-                                        data.variables[command.targetVariable] = returnValue
-                                
-                                elif command == "console":
-                                    if command == ".worldsize":
-                                        if numArgs == 1:
-                                            data.console_worldSize = int(command.arguments[0])
-                            else:
-                                if command == "include":
-                                    if numArgs == 1:
-                                        path_include = os.path.relpath(str(BFPath(path).parent / command.arguments[0]))
-                                        self.read(path_include, data)
-                                elif command == "run":
-                                    if numArgs >= 1:
-                                        path_run = BFPath(command.arguments[0])
-                                        if path_run.suffix == "":
-                                            path_run = path_run.with_suffix(".con")
-                                        path_run = os.path.relpath(str(BFPath(path).parent / path_run))
-                                        v_args_run = command.arguments[1:] if len(command.arguments) > 1 else []
-                                        BF42_script(data = data, rfaGroup = self.rfaGroup).read(path_run, v_args = v_args_run)
-                                elif command == "var":
-                                    if numArgs == 3:
-                                        data.variables[command.arguments[0]] = command.arguments[2]
-                                    elif numArgs == 1:
-                                        if command.arguments[0] not in data.variables:
-                                            data.variables[command.arguments[0]] = "" # or should it be set to None?
-                                elif command == "const":
-                                    if numArgs == 3:
-                                        data.constants[command.arguments[0]] = command.arguments[2]
-                                    elif numArgs == 1:
-                                        if command.arguments[0] not in data.constants:
-                                            data.constants[command.arguments[0]] = "" # or should it be set to None?
-                                elif command.className.lower().startswith('v_'):
+                            elif self.IFs[-1] == 1:
+                                self.IFs[-1] = 2
+                        else:
+                            pass # elseif without if
+                    elif classKey == "else" and numArgs == 0:
+                        if len(self.IFs) > 0:
+                            if self.IFs[-1] == 0:
+                                self.IFs[-1] = 1
+                            elif self.IFs[-1] == 1:
+                                self.IFs[-1] = 2
+                        else:
+                            pass # else without if
+                    elif classKey == "endif" and numArgs == 0:
+                        if len(self.IFs) > 0:
+                            self.IFs.pop()
+                        else:
+                            pass # endif without if
+                    elif not any(x in self.IFs for x in [0, 2]):
+                        if methodKey != None:
+                            if classKey == "objecttemplate":
+                                if methodKey in bf42_methods_create:
                                     if numArgs == 2:
-                                        if command.className in data.variables:
-                                            data.variables[command.className] = command.arguments[1]
-                                elif command.className.lower().startswith('c_'):
+                                        if data.getObjectTemplate(arguments[1]) == None:
+                                            data.active_ObjectTemplate = BF42_ObjectTemplate(arguments[0], arguments[1], data.getNextObjectTemplateID())
+                                            data.objectTemplates.append(data.active_ObjectTemplate)
+                                elif methodKey in bf42_methods_active:
+                                    if numArgs == 1:
+                                        refered_ObjectTemplate = data.getObjectTemplate(arguments[0])
+                                        if refered_ObjectTemplate != None:
+                                            data.active_ObjectTemplate = refered_ObjectTemplate
+                                else:
+                                    if data.active_ObjectTemplate != None:
+                                        data.active_ObjectTemplate.execMethod(methodKey, arguments)
+                            elif classKey == "networkableinfo":
+                                if methodKey in bf42_methods_createNewInfo:
+                                    if numArgs == 1:
+                                        if data.getNetworkableInfo(arguments[0]) == None:
+                                            data.active_NetworkableInfo = BF42_NetworkableInfo(arguments[0])
+                                            data.networkableInfos.append(data.active_NetworkableInfo)
+                                else:
+                                    if data.active_NetworkableInfo != None:
+                                        data.active_NetworkableInfo.execMethod(methodKey, arguments)
+                            elif classKey == "geometrytemplate":
+                                if methodKey in bf42_methods_create:
                                     if numArgs == 2:
-                                        if command.className in data.constants:
-                                            data.constants[command.className] = command.arguments[1]
+                                        if data.getGeometryTemplate(arguments[1]) == None:
+                                            data.active_GeometryTemplate = BF42_GeometryTemplate(arguments[0], arguments[1])
+                                            data.geometryTemplates.append(data.active_GeometryTemplate)
+                                elif methodKey in bf42_methods_active:
+                                    if numArgs == 1:
+                                        refered_GeometryTemplate = data.getGeometryTemplate(arguments[0])
+                                        if refered_GeometryTemplate != None:
+                                            data.active_GeometryTemplate = refered_GeometryTemplate
+                                else:
+                                    if data.active_GeometryTemplate != None:
+                                        data.active_GeometryTemplate.execMethod(methodKey, arguments)
+                            
+                            elif classKey == "object":
+                                if methodKey in bf42_methods_create:
+                                    if numArgs == 1:
+                                        data.active_Object = BF42_Object(arguments[0], data.getNextObjectID())
+                                        data.objects.append(data.active_Object)
+                                        if staticObjects:
+                                            data.staticObjects.append(data.active_Object)
+                                elif methodKey in bf42_methods_active:
+                                    if numArgs == 1:
+                                        refered_Object = data.getObject(arguments[0])
+                                        if refered_Object != None:
+                                            data.active_Object = refered_Object
+                                else:
+                                    if data.active_Object != None:
+                                        data.active_Object.setProperty(methodKey, arguments)
+                                        if methodKey in bf42_methods_name:
+                                            data.objectIndex.invalidate()
+                            
+                            elif classKey == "texturemanager":
+                                if methodKey in bf42_methods_alternativePath:
+                                    if numArgs == 1:
+                                        data.textureManager_alternativePaths.append(arguments[0])
+                            
+                            elif classKey == "game":
+                                returnValue = data.game.execMethod(methodKey, arguments)
+                                if targetVariable != None and returnValue != False and targetVariable in data.variables:
+                                    data.variables[targetVariable] = returnValue
+                            
+                            elif classKey == "console":
+                                if methodKey in bf42_methods_worldSize:
+                                    if numArgs == 1:
+                                        data.console_worldSize = int(arguments[0])
+                        else:
+                            if classKey == "include":
+                                if numArgs == 1:
+                                    path_include = os.path.relpath(str(BFPath(path).parent / arguments[0]))
+                                    self.read(path_include, data)
+                            elif classKey == "run":
+                                if numArgs >= 1:
+                                    path_run = BFPath(arguments[0])
+                                    if path_run.suffix == "":
+                                        path_run = path_run.with_suffix(".con")
+                                    path_run = os.path.relpath(str(BFPath(path).parent / path_run))
+                                    v_args_run = arguments[1:] if len(arguments) > 1 else []
+                                    BF42_script(data = data, rfaGroup = self.rfaGroup, cacheDir = self.cacheDir).read(path_run, v_args = v_args_run)
+                            elif classKey == "var":
+                                if numArgs == 3:
+                                    data.variables[arguments[0]] = arguments[2]
+                                elif numArgs == 1:
+                                    if arguments[0] not in data.variables:
+                                        data.variables[arguments[0]] = "" # or should it be set to None?
+                            elif classKey == "const":
+                                if numArgs == 3:
+                                    data.constants[arguments[0]] = arguments[2]
+                                elif numArgs == 1:
+                                    if arguments[0] not in data.constants:
+                                        data.constants[arguments[0]] = "" # or should it be set to None?
+                            elif classKey.startswith('v_'):
+                                if numArgs == 2:
+                                    if className in data.variables:
+                                        data.variables[className] = arguments[1]
+                            elif classKey.startswith('c_'):
+                                if numArgs == 2:
+                                    if className in data.constants:
+                                        data.constants[className] = arguments[1]
             except:
-                print(f'Exception in BF42_script.read(): {path} ({lineNumber}): {line}', file = sys.stderr)
+                line = className if methodKey == None else className+"."+methodKey
+                print(f'Exception in BF42_script.read(): {path} ({lineNumber}): {" ".join((line,)+tuple(arguments))}', file = sys.stderr)
         return(self.data)
 
 
-def bf42_readAllScripts(bf42_data, base_path, level = None):
+def bf42_readAllScripts(bf42_data, base_path, level = None, cacheDir = None):
     for path, subdirs, files in os.walk(BFPath(base_path) / "Objects"):
         for name in files:
             filePath = BFPath(path, name)
             if filePath.suffix.lower() == ".con":
-                BF42_script(bf42_data).read(filePath)
+                BF42_script(bf42_data, cacheDir = cacheDir).read(filePath)
     if level != None:
-        BF42_script(bf42_data).read(BFPath(base_path) / "Bf1942/Levels" / level / "Init.con", v_args = ["host"])
-        BF42_script(bf42_data).read(BFPath(base_path) / "Bf1942/Levels" / level / "Conquest.con", v_args = ["host"])
-        BF42_script(bf42_data).read(BFPath(base_path) / "Bf1942/Levels" / level / "StaticObjects.con", staticObjects = True, v_args = ["host"])
+        BF42_script(bf42_data, cacheDir = cacheDir).read(BFPath(base_path) / "Bf1942/Levels" / level / "Init.con", v_args = ["host"])
+        BF42_script(bf42_data, cacheDir = cacheDir).read(BFPath(base_path) / "Bf1942/Levels" / level / "Conquest.con", v_args = ["host"])
+        BF42_script(bf42_data, cacheDir = cacheDir).read(BFPath(base_path) / "Bf1942/Levels" / level / "StaticObjects.con", staticObjects = True, v_args = ["host"])
 
 def bf42_writeStaticCon(path, objects, data):
     data.objects = objects
@@ -721,9 +1245,9 @@ def bf42_writeStaticCon(path, objects, data):
             f.write("\n")
     return objects
 
-def bf42_readAllConFiles(base_path, level):
+def bf42_readAllConFiles(base_path, level, cacheDir = None):
     bf42_data = BF42_data()
-    bf42_readAllScripts(bf42_data, base_path, level) 
+    bf42_readAllScripts(bf42_data, base_path, level, cacheDir) 
     bf42_data.creatLinks()
     return(bf42_data)
 
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from RFA import RefractorFlatArchive, RefractorFlatArchiveGroup
+
+# Generates synthetic RFA files with RefractorFlatArchive.write and times the common archive operations.
+# Results are printed (or written) as json so runs on different commits can be compared.
+
+def generateFiles(directory, entries, meanSize, compressibility, seed):
+    rng = random.Random(seed)
+    words = [bytes(rng.choice(b"abcdefghijklmnopqrstuvwxyz") for i in range(rng.randint(3, 9))) for i in range(64)]
+    totalSize = 0
+    for i in range(entries):
+        size = min(int(rng.lognormvariate(0, 1.2)*meanSize/2), 64*meanSize)
+        parts = []
+        length = 0
+        while length < size: # compressibility is the chance that a block of text is used instead of random bytes
+            if rng.random() < compressibility:
+                part = b" ".join(rng.choice(words) for j in range(32))
+            else:
+                part = rng.randbytes(256)
+            parts.append(part)
+            length += len(part)
+        path = os.path.join(directory, "bf1942", "levels", "level%d" % (i % 16), "dir%d" % (i % 7), "File_%d.con" % i)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(path, "wb") as f:
+            f.write(b"".join(parts)[:size])
+        totalSize += size
+    return(totalSize)
+
+def timeIt(results, name, function, repeat = 1):
+    best = None
+    for i in range(repeat):
+        timeStart = time.perf_counter()
+        result = function()
+        duration = time.perf_counter()-timeStart
+        best = duration if best == None else min(best, duration)
+    results[name] = best
+    return(result)
+
+def getCommit():
+    try: return(subprocess.run(["git", "rev-parse", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)), capture_output = True, text = True).stdout.strip() or None)
+    except OSError: return(None)
+
+def runBenchmark(entries = 2000, meanSize = 16384, compressibility = 0.7, archives = 3, lookups = 2000, repeat = 3, workers = 1, seed = 1942, workDir = None):
+    results = {"commit": getCommit(), "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "parameters": {"entries": entries, "meanSize": meanSize, "compressibility": compressibility, "archives": archives, "lookups": lookups, "repeat": repeat, "workers": workers, "seed": seed},
+        "times": {}}
+    times = results["times"]
+    workDir = tempfile.mkdtemp(prefix = "rfa_benchmark_", dir = workDir)
+    try:
+        rfaPaths = []
+        for i in range(archives):
+            sourceDir = os.path.join(workDir, "source%d" % i)
+            results.setdefault("ucsize", 0)
+            results["ucsize"] += generateFiles(sourceDir, entries, meanSize, compressibility, seed+i)
+            rfaPath = os.path.join(workDir, "archive%d.rfa" % i)
+            rfa = RefractorFlatArchive(rfaPath, read = False)
+            rfa.addDirectory(sourceDir)
+            timeIt(times, "write" if i == 0 else "write_%d" % i, lambda: rfa.write(rfaPath, workers = workers))
+            rfaPaths.append(rfaPath)
+        results["csize"] = sum(os.path.getsize(rfaPath) for rfaPath in rfaPaths)
+
+        rfa = timeIt(times, "open", lambda: RefractorFlatArchive(rfaPaths[0]), repeat)
+        paths = rfa.getFileList()
+        rng = random.Random(seed)
+        lookupPaths = [rng.choice(paths).upper() for i in range(lookups)]
+        timeIt(times, "lookup", lambda: [rfa.getCorrectFilePath(path) for path in lookupPaths], repeat)
+        largestPath = max(paths, key = lambda path: rfa.getFileInfo(path)[1].ucsize)
+        timeIt(times, "extract_single", lambda: rfa.extractFile(largestPath, asString = True), repeat)
+        with rfa:
+            timeIt(times, "extract_single_mapped", lambda: rfa.extractFile(largestPath, asString = True), repeat)
+        extractDir = os.path.join(workDir, "extracted")
+        timeIt(times, "extractAll", lambda: rfa.extractAll(extractDir, workers = workers), 1)
+
+        group = timeIt(times, "group_open", lambda: RefractorFlatArchiveGroup(rfaPaths), repeat)
+        timeIt(times, "group_getFileList", lambda: group.getFileList(), repeat)
+        timeIt(times, "group_lookup", lambda: [group.getCorrectFilePath(path) for path in lookupPaths], repeat)
+    finally:
+        shutil.rmtree(workDir, ignore_errors = True)
+    return(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark RFA reading and writing with synthetic archives")
+    parser.add_argument("--entries", type = int, default = 2000, help = "files per archive")
+    parser.add_argument("--mean-size", type = int, default = 16384, help = "mean file size in bytes")
+    parser.add_argument("--compressibility", type = float, default = 0.7, help = "0 = random data, 1 = text only")
+    parser.add_argument("--archives", type = int, default = 3, help = "archives in the group")
+    parser.add_argument("--lookups", type = int, default = 2000)
+    parser.add_argument("--repeat", type = int, default = 3, help = "the best of this many runs is reported")
+    parser.add_argument("--workers", type = int, default = 1)
+    parser.add_argument("--seed", type = int, default = 1942)
+    parser.add_argument("--work-dir", default = None, help = "where the temporary archives are created")
+    parser.add_argument("--output", default = None, help = "json file to write the results to")
+    args = parser.parse_args()
+    results = runBenchmark(args.entries, args.mean_size, args.compressibility, args.archives, args.lookups, args.repeat, args.workers, args.seed, args.work_dir)
+    if args.output == None:
+        json.dump(results, sys.stdout, indent = 2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent = 2)